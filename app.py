@@ -1,10 +1,15 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
+import charts
 import database
 import logic
+import peers
+import reports
+import simulation
+import validation
+import instrumentation
 import os
-from fpdf import FPDF
+import concurrent.futures
 
 # --- 1. PAGE CONFIGURATION ---
 st.set_page_config(
@@ -20,61 +25,26 @@ if 'page_selection' not in st.session_state:
 def set_page_selection(page_name):
     st.session_state.page_selection = page_name
 
-# --- 3. HELPER FUNCTION: PDF GENERATION ---
-def create_pdf(department, scores, recommendations):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    
-    # Title
-    pdf.set_font("Arial", "B", 20)
-    pdf.cell(0, 15, f"Digital Maturity Report: {department}", ln=True, align="C")
-    pdf.ln(5)
-    
-    # Section 1: Scores
-    pdf.set_font("Arial", "B", 14)
-    pdf.set_fill_color(200, 220, 255)
-    pdf.cell(0, 10, "1. Assessment Scores (Weighted Model)", ln=True, fill=True)
-    pdf.ln(5)
-    
-    pdf.set_font("Arial", "", 12)
-    for category, score in scores.items():
-        pdf.cell(100, 10, f"{category}: {score} / 5.0", ln=True)
-    
-    pdf.ln(10)
-    
-    # Section 2: Strategic Roadmap
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, "2. Strategic Roadmap & Recommendations", ln=True, fill=True)
-    pdf.ln(5)
-    
-    for category, rec in recommendations.items():
-        pdf.set_font("Arial", "B", 12)
-        pdf.set_text_color(0, 102, 204) # Blue header
-        pdf.cell(0, 8, category, ln=True)
-        
-        pdf.set_font("Arial", "", 10)
-        pdf.set_text_color(0, 0, 0) # Black text
-        pdf.multi_cell(0, 6, f"- {rec}")
-        pdf.ln(3)
-        
-    return pdf.output(dest="S").encode("latin-1")
-
-# --- 4. SIDEBAR NAVIGATION ---
+# --- 3. SIDEBAR NAVIGATION ---
 if os.path.exists("logo.svg"):
     st.sidebar.image("logo.svg", width=180)
 
 st.sidebar.title("Navigation")
 dark_mode = st.sidebar.toggle("Dark Mode", value=True) 
 
-# Navigation Widget
+# Navigation Widget (Diagnostics is only listed when the URL has ?diagnostics)
+pages = ["Home", "Assessment", "Upload Data", "Dashboard", "Roadmap", "Explorer", "Contact"]
+if "diagnostics" in st.query_params:
+    pages.append("Diagnostics")
 page = st.sidebar.radio(
     "Go to", 
-    ["Home", "Assessment", "Upload Data", "Dashboard", "Roadmap", "Contact"],
+    pages,
     key="page_selection" 
 )
+# One trace per rerun; spans recorded below (database, logic, charts, reports) nest under it
+rerun_trace = instrumentation.begin(f"page.{page}")
 
-# --- 5. CSS STYLING ---
+# --- 4. CSS STYLING ---
 chart_template = "plotly_dark" if dark_mode else "plotly_white"
 text_color = "white" if dark_mode else "black"
 
@@ -93,7 +63,7 @@ comp_text = "white" if dark_mode else "#0f172a"
 comp_hover_bg = "#334155" if dark_mode else "#f1f5f9"
 comp_primary = "#3B82F6" # Blue stays same
 
-st.markdown(f"""
+page_css = f"""
 <style>
     /* GLOBAL: Main Container */
     [data-testid="stAppViewContainer"] {{
@@ -244,12 +214,19 @@ st.markdown(f"""
         height: 100%;
     }}
 </style>
-""", unsafe_allow_html=True)
+"""
+with instrumentation.span("app.css", nbytes=len(page_css)):
+    st.markdown(page_css, unsafe_allow_html=True)
 
 st.sidebar.markdown("---")
 st.sidebar.info("Digital Maturity Assessment Tool v7.4")
 
-# --- 6. PAGE LOGIC ---
+# --- 5. PAGE LOGIC ---
+
+def show_chart(fig):
+    """Render a Plotly figure; serialisation is timed as its own span."""
+    with instrumentation.span("app.plotly_chart", rows=len(fig.data)):
+        st.plotly_chart(fig, use_container_width=True, theme=None)
 
 # ----------------- HOME PAGE -----------------
 if page == "Home":
@@ -309,77 +286,104 @@ elif page == "Assessment":
         notes = st.text_area("Additional Notes / Context")
         if st.form_submit_button("Submit Assessment"):
             if dept:
-                database.save_assessment(dept, tech, culture, process, skills, risk)
-                st.toast("Assessment saved successfully!")
+                # Queued on the single writer thread, so a running import never makes this fail with "database is locked"
+                saved = database.submit_assessment(dept, tech, culture, process, skills, risk)
+                try:
+                    saved.result(timeout=2)
+                    st.toast("Assessment saved successfully!")
+                except concurrent.futures.TimeoutError:
+                    st.toast("Assessment queued; it will be saved as soon as the running import commits.")
+                except Exception as e:
+                    st.error(f"Could not save the assessment: {e}")
             else:
                 st.error("Please enter a Department Name.")
 
 # ----------------- UPLOAD PAGE -----------------
 elif page == "Upload Data":
     st.title("Upload Enterprise Data")
-    st.markdown("Upload a CSV file with columns: `Department`, `Tech`, `Culture`, `Process`, `Skills`, `Risk`")
+    st.markdown("Upload a CSV or Parquet file with columns: `Department`, `Tech`, `Culture`, `Process`, `Skills`, `Risk`")
     col_up, col_reset = st.columns([3, 1])
-    uploaded_file = col_up.file_uploader("Choose a CSV file", type="csv")
+    uploaded_file = col_up.file_uploader("Choose a CSV or Parquet file", type=["csv", "parquet"])
     if col_reset.button("Clear Previous Data", type="secondary"):
         database.clear_data()
+        st.session_state.pop('upload_report', None)
         st.rerun()
+    if col_reset.button("Remove Duplicates", type="secondary", help="Delete repeated assessments (same department and scores in the same month)"):
+        removed = database.compact_assessments()
+        col_reset.success(f"Removed {removed:,} duplicates")
     
     if uploaded_file is not None:
         st.success(f"Selected File: {uploaded_file.name}")
         try:
-            df = pd.read_csv(uploaded_file)
-            required_cols = ['Department', 'Tech', 'Culture', 'Process', 'Skills', 'Risk']
-            if all(col in df.columns for col in required_cols):
-                st.write("Preview:", df.head())
+            upload_format = 'parquet' if uploaded_file.name.lower().endswith('.parquet') else 'csv'
+            preview = next(database.iter_upload_chunks(uploaded_file, upload_format, chunksize=5))
+            uploaded_file.seek(0)
+            required_cols = list(database.CSV_COLUMNS)
+            # Snapshot files use the table column names; show and check them as CSV headers
+            preview = preview.rename(columns={col: header for header, col in database.CSV_COLUMNS.items()})
+            if all(col in preview.columns for col in required_cols):
+                st.write("Preview:", preview)
+                import_modes = {"Update this month's assessments": 'upsert', "Add as new assessments": 'append'}
+                import_mode = import_modes[st.radio("Import mode", list(import_modes), horizontal=True, help="Updating keeps one assessment per department per month, so re-uploading a file does not duplicate it. Only the first row of each department in the file is used; add as new assessments to keep every row.")]
                 if st.button("Import Data to Database"):
-                    for _, row in df.iterrows():
-                        database.save_assessment(row['Department'], row['Tech'], row['Culture'], row['Process'], row['Skills'], row['Risk'])
-                    st.success(f"Successfully imported {len(df)} rows!")
+                    # Stream the file in chunks so large uploads are never parsed in one go
+                    uploaded_file.seek(0)
+                    progress_bar = st.progress(0.0, text="Importing...")
+                    def report_progress(rows_saved):
+                        fraction = min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0)
+                        progress_bar.progress(fraction, text=f"Imported {rows_saved:,} rows...")
+                    chunks = database.iter_upload_chunks(uploaded_file, upload_format, columns=required_cols)
+                    # Bad rows are set aside for the error report instead of aborting the import
+                    validation_report = validation.ValidationReport()
+                    valid_chunks = validation_report.validate(chunks)
+                    if import_mode == 'upsert':
+                        counts = database.upsert_assessments(valid_chunks, progress=report_progress)
+                        outcome = f"{counts['inserted']:,} inserted, {counts['updated']:,} updated, {counts['skipped']:,} unchanged"
+                        if counts['repeated']:
+                            outcome += f", {counts['repeated']:,} repeated departments ignored (one row per department per import)"
+                    else:
+                        outcome = f"{database.bulk_save_assessments(valid_chunks, progress=report_progress):,} inserted"
+                    st.session_state['upload_report'] = {
+                        'file': uploaded_file.name,
+                        'summary': f"{outcome}; {validation_report.summary()}",
+                        'rejected': validation_report.rows_rejected,
+                        'errors': validation_report.to_csv() if validation_report.rows_rejected else None,
+                    }
                     st.rerun()
             else:
                 st.error(f"CSV must contain strictly these columns: {required_cols}")
         except Exception as e:
             st.error(f"Error processing file: {e}")
 
+    upload_report = st.session_state.get('upload_report')
+    if upload_report:
+        if upload_report['rejected']:
+            st.warning(f"Imported {upload_report['file']}: {upload_report['summary']}.")
+            error_name = upload_report['file'].rsplit('.', 1)[0] + "_errors.csv"
+            st.download_button("Download Error Report", upload_report['errors'], file_name=error_name, mime="text/csv")
+        else:
+            st.success(f"Successfully imported {upload_report['file']}: {upload_report['summary']}.")
+
 # ----------------- DASHBOARD PAGE -----------------
 elif page == "Dashboard":
     st.title("Maturity Dashboard")
-    df = database.load_data()
+    kpis = database.get_kpis()
     
-    if not df.empty:
-        df['Maturity Index'] = df.apply(logic.calculate_maturity_index, axis=1)
-        
-        def get_label(score):
-            if score >= 4.0: return "Advanced"
-            elif score >= 3.0: return "Established"
-            elif score >= 2.0: return "Developing"
-            else: return "Nascent"
-            
-        df['Maturity Label'] = df['Maturity Index'].apply(get_label)
-        
+    if kpis['total']:
         kpi1, kpi2, kpi3 = st.columns(3)
-        kpi1.metric("Total Assessments", len(df))
-        kpi2.metric("Avg Maturity Index", f"{df['Maturity Index'].mean():.2f}")
-        top_dept_idx = df['Maturity Index'].idxmax()
-        kpi3.metric("Top Department", df.loc[top_dept_idx]['department'])
+        kpi1.metric("Total Assessments", kpis['total'])
+        kpi2.metric("Avg Maturity Index", f"{kpis['avg_index']:.2f}")
+        kpi3.metric("Top Department", kpis['top_department'])
         
         st.markdown("---")
         
         col_dist, col_table = st.columns([1.3, 1])
         with col_dist:
             st.subheader("Distribution by Maturity Level")
-            label_order = ["Advanced", "Established", "Developing", "Nascent"]
-            dist_counts = df['Maturity Label'].value_counts().reindex(label_order, fill_value=0)
+            dist_counts = database.get_label_distribution()
             
-            fig_dist = go.Figure(data=[go.Bar(
-                x=dist_counts.index, 
-                y=dist_counts.values,
-                text=dist_counts.values,
-                textposition='auto',
-                marker_color=['#00CC96', '#3B82F6', '#FFA15A', '#EF553B']
-            )])
-            fig_dist.update_layout(template=chart_template, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font=dict(color=text_color), margin=dict(l=20, r=20, t=30, b=20), height=350, xaxis_title="Maturity Status", yaxis_title="Count")
-            st.plotly_chart(fig_dist, use_container_width=True, theme=None)
+            fig_dist = charts.maturity_distribution(dist_counts, chart_template, text_color)
+            show_chart(fig_dist)
 
         with col_table:
             st.subheader("Overall Rankings")
@@ -387,82 +391,222 @@ elif page == "Dashboard":
             sort_order = c_sort.radio("View:", ["Top Performers", "Needs Attention"], label_visibility="collapsed", horizontal=True)
             top_n = c_slider.slider("Count", 3, 15, 5)
             
-            if sort_order == "Top Performers":
-                ranked_df = df.sort_values(by='Maturity Index', ascending=False).reset_index(drop=True)
-            else:
-                ranked_df = df.sort_values(by='Maturity Index', ascending=True).reset_index(drop=True)
-            
-            ranked_df.insert(0, 'Rank', ranked_df.index + 1)
-            st.dataframe(ranked_df.head(top_n)[['Rank', 'department', 'Maturity Index', 'Maturity Label']], use_container_width=True, hide_index=True, column_config={"Rank": st.column_config.NumberColumn("Rank", format="%d"), "department": "Department", "Maturity Label": "Status", "Maturity Index": st.column_config.ProgressColumn("Score", help="Overall Maturity Score", format="%.2f", min_value=0, max_value=5)})
+            ranked_df = database.get_rankings(top_n, ascending=(sort_order == "Needs Attention"))
+            st.dataframe(ranked_df, use_container_width=True, hide_index=True, column_config={"Rank": st.column_config.NumberColumn("Rank", format="%d"), "department": "Department", "Maturity Label": "Status", "Maturity Index": st.column_config.ProgressColumn("Score", help="Overall Maturity Score", format="%.2f", min_value=0, max_value=5)})
 
         st.markdown("---")
         
         st.markdown("### Deep Dive Analysis")
-        heatmap_data = df[['department', 'tech_score', 'culture_score', 'process_score', 'skills_score', 'risk_score']].set_index('department')
-        dynamic_height = max(300, len(heatmap_data) * 35)
-        
-        fig_heat = go.Figure(data=go.Heatmap(
-            z=heatmap_data.values, x=['Tech', 'Culture', 'Process', 'Skills', 'Risk'], y=heatmap_data.index,
-            colorscale='Viridis',
-            text=heatmap_data.values, texttemplate="%{text:.1f}", 
-            textfont={"size": 12, "color": "white" if dark_mode else "black"}, zmin=1, zmax=5,
-            colorbar=dict(title="Weighted Score")
-        ))
-        fig_heat.update_layout(title="Dimension Heatmap", template=chart_template, height=dynamic_height, yaxis=dict(autorange="reversed"), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font=dict(color=text_color))
-        st.plotly_chart(fig_heat, use_container_width=True, theme=None)
+        # Small tables keep the per-assessment view; large ones start aggregated
+        HEATMAP_ROW_LIMIT = 200
+        heat_views = ["By Unit", "By Department", "Assessments"]
+        c_view, c_stat, c_drill = st.columns([2, 1, 2])
+        heat_view = c_view.radio("Heatmap view", heat_views, index=2 if kpis['total'] <= HEATMAP_ROW_LIMIT else 0, horizontal=True, label_visibility="collapsed")
+        if heat_view == "Assessments":
+            units = sorted({logic.department_unit(name) for name in database.get_departments()})
+            drill_options = (["All"] if kpis['total'] <= HEATMAP_ROW_LIMIT else []) + units
+            drill_unit = c_drill.selectbox("Drill down to unit", drill_options, label_visibility="collapsed")
+            if drill_unit == "All":
+                heat_rows = database.load_snapshot()
+            else:
+                heat_rows = database.load_departments([name for name in database.get_departments() if logic.department_unit(name) == drill_unit])
+            fig_heat = charts.dimension_heatmap(heat_rows, chart_template, text_color, dark_mode)
+        else:
+            stat = c_stat.selectbox("Statistic", list(database.SUMMARY_STATS), format_func=lambda s: s.title(), label_visibility="collapsed")
+            group = logic.department_unit if heat_view == "By Unit" else None
+            fig_heat = charts.summary_heatmap(database.get_dimension_summary(stat, group), stat, chart_template, text_color, dark_mode)
+        show_chart(fig_heat)
         
         st.markdown("##### Radar: Comparative Profiles ")
-        dept_filter = st.multiselect("Select Departments", df['department'].unique(), default=df['department'].unique()[:2], label_visibility="collapsed")
+        departments = database.get_departments()
+        c_like, c_k = st.columns([3, 1])
+        like = c_like.selectbox("Start from departments most like", [None] + departments, format_func=lambda name: "Choose departments manually" if name is None else name)
+        k = c_k.number_input("Similar departments", min_value=1, max_value=10, value=3)
+        radar_default = departments[:2] if like is None else [like] + peers.get_peer_index().similar(like, k).index.tolist()
+        # Keyed on the starting point so picking another one resets the selection
+        dept_filter = st.multiselect("Select Departments", departments, default=radar_default, key=f"radar_{like}_{k}", label_visibility="collapsed")
         
         if dept_filter:
-            filtered_df = df[df['department'].isin(dept_filter)]
-            categories = ['Tech', 'Culture', 'Process', 'Skills', 'Risk']
-            fig_radar = go.Figure()
-            for i, row in filtered_df.iterrows():
-                fig_radar.add_trace(go.Scatterpolar(r=[row['tech_score'], row['culture_score'], row['process_score'], row['skills_score'], row['risk_score']], theta=categories, fill='toself', name=row['department']))
-            
-            fig_radar.update_layout(
-                polar=dict(radialaxis=dict(visible=True, range=[0, 5]), angularaxis=dict(tickfont=dict(size=14, color=text_color, family="Arial Black"))), 
-                showlegend=True, template=chart_template, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font=dict(color=text_color)
-            )
-            st.plotly_chart(fig_radar, use_container_width=True, theme=None)
+            filtered_df = database.load_departments(dept_filter)
+            fig_radar = charts.radar_profiles(filtered_df, chart_template, text_color)
+            show_chart(fig_radar)
     else:
         st.info("No data available.")
 
 # ----------------- ROADMAP PAGE -----------------
 elif page == "Roadmap":
     st.title("Transformation Roadmap")
-    df = database.load_data()
+    departments = database.get_departments()
     
-    if not df.empty:
-        selected_dept = st.selectbox("Select Department for Recommendations", df['department'].unique())
+    if departments:
+        selected_dept = st.selectbox("Select Department for Recommendations", departments)
         
         if selected_dept:
-            row = df[df['department'] == selected_dept].iloc[0]
+            row = database.load_latest_assessments([selected_dept]).iloc[0]
             recs = logic.get_recommendations(row)
-            scores = {'Technology': row['tech_score'], 'Process': row['process_score'], 'Culture': row['culture_score'], 'Skills': row['skills_score'], 'Risk': row['risk_score']}
+            scores = reports.report_scores(row)
+            cohort = st.radio("Benchmark against", list(peers.COHORTS), horizontal=True)
+            peer_index = peers.get_peer_index()
+            standing = peer_index.standings([selected_dept], cohort).iloc[0]
+            standings = reports.report_standings(standing, cohort)
             
             col_header, col_btn = st.columns([3, 1])
             with col_header:
                 st.subheader(f"Strategy for {selected_dept}")
             with col_btn:
-                pdf_data = create_pdf(selected_dept, scores, recs)
+                # Rendered in the report worker pool only when the button is clicked
+                pdf_data = lambda: reports.get_report(selected_dept, scores, recs, standings)
                 st.download_button(label="Download PDF Report", data=pdf_data, file_name=f"{selected_dept}_Maturity_Report.pdf", mime="application/pdf", type="primary", use_container_width=True)
+                all_reports = lambda: reports.export_reports_zip_bytes(database.load_latest_assessments())
+                st.download_button(label="Download All Reports (ZIP)", data=all_reports, file_name="Maturity_Reports.zip", mime="application/zip", use_container_width=True)
             
+            if standings:
+                st.caption(f"Maturity Index {logic.calculate_maturity_index(row):.2f} · {standings['Maturity Index']} · rank {int(standing['Maturity Index rank'])}")
+            elif peers.COHORTS[cohort] is not None:
+                st.caption(f"{selected_dept} has no peer group under '{cohort}': its name has no {cohort.split()[-1]} part.")
+
             c1, c2, c3, c4, c5 = st.columns(5)
-            def show_card(col, title, score, rec):
+            def show_card(col, title, score, rec, column):
                 with col:
                     color = '#48BB78' if score > 4 else '#ECC94B' if score > 2.5 else '#F56565'
-                    st.markdown(f"""<div class="prof-card" style="padding: 20px; border-left: 5px solid {color};"><h4 style="margin-top:0; color:{color} !important;">{title}</h4><div style="font-size: 1.2rem; font-weight:bold; color: {color}; margin-bottom: 10px;">Score: {score}</div><p style="font-size: 0.9rem; line-height: 1.4;">{rec}</p></div>""", unsafe_allow_html=True)
+                    top = peers.top_text(standing[f'{column} top %'])
+                    peer_line = f"""<div style="font-size: 0.85rem; opacity: 0.8; margin-bottom: 10px;">{top} · #{int(standing[f'{column} rank'])} of {int(standing['peers'])}</div>""" if top else ""
+                    st.markdown(f"""<div class="prof-card" style="padding: 20px; border-left: 5px solid {color};"><h4 style="margin-top:0; color:{color} !important;">{title}</h4><div style="font-size: 1.2rem; font-weight:bold; color: {color}; margin-bottom: 4px;">Score: {score}</div>{peer_line}<p style="font-size: 0.9rem; line-height: 1.4;">{rec}</p></div>""", unsafe_allow_html=True)
+
+            show_card(c1, "Tech", scores['Technology'], recs.get('Tech'), 'tech_score')
+            show_card(c2, "Process", scores['Process'], recs.get('Process'), 'process_score')
+            show_card(c3, "Culture", scores['Culture'], recs.get('Culture'), 'culture_score')
+            show_card(c4, "Skills", scores['Skills'], recs.get('Skills'), 'skills_score')
+            show_card(c5, "Risk", scores['Risk'], recs.get('Risk'), 'risk_score')
+
+            st.markdown("---")
+            st.subheader("Similar Departments")
+            similar = peer_index.similar(selected_dept, 5, cohort)
+            if similar.empty:
+                st.caption(f"No other departments to compare {selected_dept} with in this cohort.")
+            else:
+                higher = peer_index.closest_higher(selected_dept, cohort)
+                if higher is None:
+                    st.success(f"{selected_dept} has the highest Maturity Index in this cohort.")
+                else:
+                    gaps = pd.Series(higher[logic.SCORE_COLUMNS].to_numpy() - peer_index.scores.loc[selected_dept, logic.SCORE_COLUMNS].to_numpy(), index=logic.DIMENSIONS)
+                    st.info(f"Closest higher-maturity peer: **{higher.name}** (Maturity Index {higher['Maturity Index']:.2f}, distance {higher['distance']:.2f}). Biggest gap: {gaps.idxmax()} (+{gaps.max():.1f}).")
+                similar_table = similar.rename(columns=dict(zip(logic.SCORE_COLUMNS, logic.DIMENSIONS))).rename_axis('Department').reset_index()
+                st.dataframe(similar_table, use_container_width=True, hide_index=True, column_config={"distance": st.column_config.NumberColumn("Distance", format="%.2f"), "Maturity Index": st.column_config.ProgressColumn("Score", format="%.2f", min_value=0, max_value=5)})
+
+            st.markdown("---")
+            col_trend_title, col_period = st.columns([3, 1])
+            col_trend_title.subheader("Score History")
+            period = col_period.radio("Granularity", ["week", "month"], index=1, format_func=str.title, horizontal=True, label_visibility="collapsed")
+            history = database.load_department_history(selected_dept, period)
+            if len(history) > 1:
+                fig_trend = charts.score_history(history, chart_template, text_color)
+                show_chart(fig_trend)
+            else:
+                st.caption(f"Only one {period} of assessments recorded for {selected_dept} so far.")
 
-            show_card(c1, "Tech", row['tech_score'], recs.get('Tech'))
-            show_card(c2, "Process", row['process_score'], recs.get('Process'))
-            show_card(c3, "Culture", row['culture_score'], recs.get('Culture'))
-            show_card(c4, "Skills", row['skills_score'], recs.get('Skills'))
-            show_card(c5, "Risk", row['risk_score'], recs.get('Risk'))
+            st.markdown("---")
+            st.subheader("What-if Simulation")
+            st.caption("Try score changes on the latest assessments without saving anything. Scores stay within 1-5.")
+            c_scope, c_all, c_weights = st.columns([3, 1, 1])
+            simulate_all = c_all.checkbox("All departments")
+            sim_departments = c_scope.multiselect("Departments to simulate", departments, default=[selected_dept], disabled=simulate_all)
+            weighting = c_weights.radio("Weighting", ["Equal", "Strategic"], horizontal=True)
+            delta_cols = st.columns(5)
+            deltas = {dim: col.number_input(f"{dim} change", min_value=-4.0, max_value=4.0, value=0.0, step=0.1, key=f"whatif_{dim}") for col, dim in zip(delta_cols, logic.DIMENSIONS)}
+
+            if simulate_all or sim_departments:
+                baseline = database.load_latest_assessments(None if simulate_all else sim_departments)
+                weights = logic.STRATEGIC_WEIGHTS if weighting == "Strategic" else None
+                outcome = simulation.simulate(baseline, deltas, weights)
+                result = outcome.summary().iloc[0]
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("Mean Maturity Index", f"{result['Maturity Index']:.2f}", f"{result['Index Change']:+.2f}")
+                m2.metric("Up a level", int(result['Level Ups']))
+                m3.metric("Down a level", int(result['Level Downs']))
+                m4.metric("New recommendations", int(result['Changed Recommendations']), help="Departments with at least one different recommendation")
+                sim_table = outcome.department_results().rename_axis('Department').reset_index()
+                st.dataframe(sim_table, use_container_width=True, hide_index=True, column_config={"Current Index": st.column_config.NumberColumn("Current Index", format="%.2f"), "Maturity Index": st.column_config.ProgressColumn("Simulated Index", format="%.2f", min_value=0, max_value=5), "Maturity Label": "Simulated Status", "Current Label": "Current Status"})
+
+                metric = st.radio("Sensitivity of", ["Maturity Index", "Level Ups", "Level Downs", "Changed Recommendations"], horizontal=True)
+                st.caption("Each line moves one dimension from -1 to +1 point on top of the changes above.")
+                fig_sensitivity = charts.sensitivity(simulation.sensitivity(baseline, deltas, weights=weights), metric, chart_template, text_color)
+                show_chart(fig_sensitivity)
     else:
         st.info("No data available.")
 
+# ----------------- EXPLORER PAGE -----------------
+elif page == "Explorer":
+    st.title("Assessment Explorer")
+    st.markdown("Browse every assessment ranked by Maturity Index. Only the current page is loaded.")
+    c_search, c_label, c_order, c_size = st.columns([2, 1, 1, 1])
+    search = c_search.text_input("Department contains", placeholder="e.g. CSE")
+    label_filter = c_label.selectbox("Status", ["All"] + logic.MATURITY_LABELS[::-1])
+    order = c_order.radio("Order", ["Highest first", "Lowest first"])
+    page_size = c_size.selectbox("Rows per page", [25, 50, 100])
+
+    # Page start cursors; any filter change goes back to the first page
+    filters = (search, label_filter, order, page_size)
+    if st.session_state.get('explorer_filters') != filters:
+        st.session_state['explorer_filters'] = filters
+        st.session_state['explorer_cursors'] = [None]
+    cursors = st.session_state['explorer_cursors']
+
+    page_df, next_cursor = database.get_assessment_page(
+        cursors[-1], page_size, descending=(order == "Highest first"),
+        department_contains=search or None, label=None if label_filter == "All" else label_filter)
+
+    if page_df.empty:
+        st.info("No assessments match these filters.")
+    else:
+        first_rank = (len(cursors) - 1) * page_size + 1
+        page_df.insert(0, 'Rank', range(first_rank, first_rank + len(page_df)))
+        st.dataframe(page_df[['Rank', 'department', 'Maturity Index', 'Maturity Label'] + logic.SCORE_COLUMNS + ['timestamp']], use_container_width=True, hide_index=True, column_config={"Rank": st.column_config.NumberColumn("Rank", format="%d"), "department": "Department", "Maturity Label": "Status", "Maturity Index": st.column_config.ProgressColumn("Score", format="%.2f", min_value=0, max_value=5)})
+
+    def explorer_next(cursor):
+        st.session_state['explorer_cursors'].append(cursor)
+
+    def explorer_prev():
+        st.session_state['explorer_cursors'].pop()
+
+    c_prev, c_page, c_next = st.columns([1, 2, 1])
+    c_prev.button("Previous", disabled=len(cursors) == 1, on_click=explorer_prev, use_container_width=True)
+    c_page.markdown(f"<p style='text-align:center; margin-top: 8px;'>Page {len(cursors)}</p>", unsafe_allow_html=True)
+    c_next.button("Next", disabled=next_cursor is None, on_click=explorer_next, args=(next_cursor,), use_container_width=True)
+
+# ----------------- DIAGNOSTICS PAGE -----------------
+elif page == "Diagnostics":
+    st.title("Diagnostics")
+    st.markdown("Timings of instrumented calls (database, scoring, chart building, PDF rendering) recorded by this server process.")
+    c_rate, c_reset = st.columns([3, 1])
+    rate = c_rate.slider("Sample rate", 0.0, 1.0, float(instrumentation.SAMPLE_RATE), 0.05, help="Fraction of reruns recorded; 0 turns instrumentation off")
+    if rate != instrumentation.SAMPLE_RATE:
+        instrumentation.configure(rate)
+    if c_reset.button("Reset", use_container_width=True):
+        instrumentation.reset()
+
+    spans = pd.DataFrame(instrumentation.summary())
+    if spans.empty:
+        st.info("Nothing recorded yet. Raise the sample rate (or set MATURITY_TRACE_SAMPLE_RATE) and use the other pages.")
+    else:
+        spans['total_ms'] = spans.pop('total_seconds') * 1000
+        spans['mean_ms'] = spans.pop('mean_seconds') * 1000
+        spans['max_ms'] = spans.pop('max_seconds') * 1000
+        spans['MB'] = spans.pop('bytes') / 2**20
+        st.markdown("##### Spans by total time")
+        st.dataframe(spans, use_container_width=True, hide_index=True, column_config={col: st.column_config.NumberColumn(format="%.2f") for col in ['total_ms', 'mean_ms', 'max_ms', 'MB']})
+
+        st.markdown("##### Recent spans")
+        latest = pd.DataFrame(instrumentation.recent(200))
+        latest['span'] = ["  " * depth + name for depth, name in zip(latest['depth'], latest['span'])]
+        latest['ms'] = latest.pop('seconds') * 1000
+        latest['started'] = pd.to_datetime(latest['started'], unit='s')
+        st.dataframe(latest.drop(columns='depth'), use_container_width=True, hide_index=True, column_config={"ms": st.column_config.NumberColumn(format="%.2f")})
+
+        c_json, c_prom = st.columns(2)
+        c_json.download_button("Download JSON", instrumentation.to_json, file_name="maturity_diagnostics.json", mime="application/json", use_container_width=True)
+        c_prom.download_button("Download Prometheus text", instrumentation.to_prometheus, file_name="maturity_metrics.prom", mime="text/plain", use_container_width=True)
+
 # ----------------- CONTACT PAGE -----------------
 elif page == "Contact":
     st.title("Contact Us")
@@ -478,3 +622,5 @@ st.markdown(f"""
     <p style="margin:0; font-weight: 500;">Copyright © 2025 by Team-9 | Digital Maturity Platform</p>
 </div>
 """, unsafe_allow_html=True)
+
+instrumentation.end(rerun_trace)
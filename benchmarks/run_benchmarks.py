@@ -0,0 +1,235 @@
+"""
+Benchmarks for the platform's hot paths: CSV ingestion, loading, scoring,
+recommendations, dashboard figure construction and PDF rendering.
+
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --output bench_results.json
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 1000000 --compare bench_results.json
+
+Every size runs against a fresh temporary database filled with synthetic
+assessments. Results (seconds, rows/s and peak traced memory per step) are
+written as JSON; --compare flags steps that got slower than a previous run.
+Each step runs twice: timed without tracing, then under tracemalloc for
+its peak memory, since tracing slows allocation-heavy code several-fold.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+import database
+import logic
+import simulation
+import validation
+
+UNITS = ['CSE', 'ECE', 'DSAI', 'Finance', 'HR', 'IT_Services', 'Library', 'Security', 'Medical_Unit', 'Admin']
+ROLES = ['Student', 'Staff', 'Faculty', 'Engineer']
+
+# Row-by-row paths are timed on a sample and reported per row
+SCALAR_SAMPLE = 2000
+PDF_SAMPLE = 20
+SIMULATION_SCENARIOS = 1000
+
+def generate_assessments(n, seed=0):
+    """
+    Synthetic upload in the CSV format of the Upload page, with department
+    names shaped like the IIITNR dataset (Unit_Role_k) and roughly 20
+    assessments per department.
+    """
+    rng = np.random.default_rng(seed)
+    n_departments = max(len(UNITS), n // 20)
+    names = np.array([f"{UNITS[i % len(UNITS)]}_{ROLES[(i // len(UNITS)) % len(ROLES)]}_{i // (len(UNITS) * len(ROLES)) + 1}"
+                      for i in range(n_departments)])
+    base = rng.uniform(1.5, 4.5, size=(n_departments, 1))
+    dept_idx = rng.integers(0, n_departments, size=n)
+    scores = np.clip(base[dept_idx] + rng.normal(0, 0.6, size=(n, 5)), 1.0, 5.0).round(1)
+    df = pd.DataFrame(scores, columns=['Tech', 'Culture', 'Process', 'Skills', 'Risk'])
+    df.insert(0, 'Department', names[dept_idx])
+    return df
+
+def measure(results, size, name, func, rows, setup=None):
+    """
+    Appends the wall time and throughput of an untraced run of func and the
+    peak traced memory of a second run to results. setup(), when given, runs
+    before each run so steps that write start from the same state.
+    Returns the value of the timed run.
+    """
+    if setup is not None:
+        setup()
+    start = time.perf_counter()
+    value = func()
+    seconds = time.perf_counter() - start
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        'size': size,
+        'name': name,
+        'rows': rows,
+        'seconds': round(seconds, 6),
+        'rows_per_sec': round(rows / seconds, 1) if seconds > 0 else None,
+        'peak_mb': round(peak / 2**20, 3),
+    }
+    results.append(result)
+    print(f"  {name:<32} {seconds:>9.3f}s {result['rows_per_sec'] or 0:>14,.0f} rows/s {result['peak_mb']:>9.1f} MB", flush=True)
+    return value
+
+def use_database(path):
+    database.DB_NAME = path
+    database.get_pool()
+
+def fresh_database(workdir, name):
+    """measure() setup for steps that write: a new empty database file on every call."""
+    runs = itertools.count()
+    return lambda: use_database(os.path.join(workdir, f'{name}_{next(runs)}.db'))
+
+def import_upload(path):
+    """The Upload page's default import: validated CSV chunks upserted per department and month."""
+    report = validation.ValidationReport()
+    chunks = database.iter_upload_chunks(path, columns=list(database.CSV_COLUMNS))
+    return database.upsert_assessments(report.validate(chunks))
+
+def run_size(size, workdir, results):
+    print(f"\n{size:,} assessments")
+    upload = generate_assessments(size)
+    csv_path = os.path.join(workdir, f'upload_{size}.csv')
+    upload.to_csv(csv_path, index=False)
+
+    # Streamed CSV -> bulk insert (append mode); the database the later steps read
+    measure(results, size, 'ingest_bulk', lambda: database.bulk_save_assessments(
+        pd.read_csv(csv_path, usecols=list(database.CSV_COLUMNS), chunksize=database.IMPORT_CHUNK_SIZE)), size,
+        setup=fresh_database(workdir, f'bench_{size}'))
+    main_db = database.DB_NAME
+
+    # Upload page and CLI default: validation + upsert (separate databases). One row per
+    # department, as in a monthly extract, so every row is written rather than ignored as a repeat
+    upsert_path = os.path.join(workdir, f'upload_{size}_monthly.csv')
+    upload.assign(Department=upload['Department'] + '_' + upload.index.astype(str)).to_csv(upsert_path, index=False)
+    measure(results, size, 'ingest_upload', lambda: import_upload(upsert_path), size,
+            setup=fresh_database(workdir, f'bench_{size}_upload'))
+
+    # Assessment form: one save_assessment call per row (separate databases)
+    sample = upload.head(min(size, SCALAR_SAMPLE))
+    measure(results, size, 'save_assessment', lambda: [
+        database.save_assessment(*row) for row in sample.itertuples(index=False, name=None)], len(sample),
+        setup=fresh_database(workdir, f'bench_{size}_single'))
+    use_database(main_db)
+
+    df = measure(results, size, 'load_data', database.load_data, size)
+    measure(results, size, 'load_snapshot_cold', database.load_snapshot, size, setup=database.invalidate_snapshot)
+    measure(results, size, 'load_snapshot_warm', database.load_snapshot, size)
+
+    measure(results, size, 'score_frame', lambda: logic.score_frame(df), size)
+    scalar = df.head(SCALAR_SAMPLE)
+    measure(results, size, 'calculate_maturity_index_apply', lambda: scalar.apply(logic.calculate_maturity_index, axis=1), len(scalar))
+
+    measure(results, size, 'get_recommendations_frame', lambda: logic.get_recommendations_frame(df), size)
+    measure(results, size, 'get_recommendations_scalar', lambda: [
+        logic.get_recommendations(row) for _, row in scalar.iterrows()], len(scalar))
+
+    measure(results, size, 'dashboard_queries', lambda: (
+        database.get_kpis(), database.get_label_distribution(), database.get_rankings(15)), size)
+    measure(results, size, 'latest_assessments', database.load_latest_assessments, size)
+    latest = database.load_latest_assessments()
+    deltas = simulation.random_deltas(SIMULATION_SCENARIOS, seed=0)
+    measure(results, size, 'simulate_scenarios', lambda: simulation.simulate(latest, deltas), SIMULATION_SCENARIOS * len(latest))
+    measure(results, size, 'dimension_summary', lambda: (
+        database.get_dimension_summary('mean', logic.department_unit), database.get_dimension_summary('median')), size)
+
+    try:
+        import charts
+    except ImportError:
+        print("  plotly not installed, skipping figure benchmarks")
+    else:
+        def build_dashboard():
+            departments = database.get_departments()
+            summary = database.get_dimension_summary('mean', logic.department_unit)
+            figures = [
+                charts.maturity_distribution(database.get_label_distribution(), 'plotly_dark', 'white'),
+                charts.summary_heatmap(summary, 'mean', 'plotly_dark', 'white', True),
+                charts.radar_profiles(database.load_departments(departments[:2]), 'plotly_dark', 'white'),
+            ]
+            return sum(len(fig.to_json()) for fig in figures)
+        payload = measure(results, size, 'dashboard_figures', build_dashboard, size)
+        results[-1]['payload_bytes'] = payload
+
+    try:
+        import reports
+    except ImportError:
+        print("  fpdf not installed, skipping PDF benchmark")
+    else:
+        latest = database.load_latest_assessments().head(PDF_SAMPLE)
+        recs = logic.get_recommendations_frame(latest)
+        measure(results, size, 'create_pdf', lambda: [
+            reports.create_pdf(row['department'], reports.report_scores(row), rec.to_dict())
+            for (_, row), (_, rec) in zip(latest.iterrows(), recs.iterrows())], len(latest))
+
+    database.close_connections()
+    database.invalidate_snapshot()
+
+def compare(results, baseline_path, threshold):
+    """Prints the slowdown of every step against a previous run; returns the number of regressions."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['size'], r['name']): r for r in json.load(f)['results']}
+
+    regressions = 0
+    print(f"\nComparison with {baseline_path} (regression threshold +{threshold:.0%})")
+    for result in results:
+        before = baseline.get((result['size'], result['name']))
+        if before is None or not before['seconds']:
+            continue
+        ratio = result['seconds'] / before['seconds']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"  {result['size']:>9,} {result['name']:<32} {before['seconds']:>9.3f}s -> {result['seconds']:>9.3f}s ({ratio:5.2f}x){flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000], help='numbers of assessments to benchmark')
+    parser.add_argument('--output', '-o', default='bench_results.json', help='JSON file for the results')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            run_size(size, workdir, results)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
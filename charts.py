@@ -0,0 +1,93 @@
+import numpy as np
+import plotly.graph_objects as go
+import instrumentation
+import logic
+
+# Shared transparent background so charts blend into the themed page
+TRANSPARENT = 'rgba(0,0,0,0)'
+# Above this many heatmap cells the per-cell score labels are dropped
+HEATMAP_TEXT_MAX_CELLS = 1500
+
+def _measure_figure(span, fig):
+    """Instrumentation measure: number of plotted values across all traces."""
+    values = 0
+    for trace in fig.data:
+        for attr in ('z', 'r', 'y'):
+            data = getattr(trace, attr, None)
+            if data is not None:
+                values += int(np.size(data))
+                break
+    span.rows = values
+
+@instrumentation.timed(measure=_measure_figure)
+def maturity_distribution(dist_counts, chart_template, text_color):
+    """Bar chart of assessments per maturity level."""
+    fig_dist = go.Figure(data=[go.Bar(
+        x=dist_counts.index, 
+        y=dist_counts.values,
+        text=dist_counts.values,
+        textposition='auto',
+        marker_color=['#00CC96', '#3B82F6', '#FFA15A', '#EF553B']
+    )])
+    fig_dist.update_layout(template=chart_template, paper_bgcolor=TRANSPARENT, plot_bgcolor=TRANSPARENT, font=dict(color=text_color), margin=dict(l=20, r=20, t=30, b=20), height=350, xaxis_title="Maturity Status", yaxis_title="Count")
+    return fig_dist
+
+def _heatmap(heatmap_data, chart_template, text_color, dark_mode, title, colorbar_title):
+    dynamic_height = max(300, len(heatmap_data) * 35)
+    # Per-cell labels dominate the payload and are unreadable on big grids
+    show_text = heatmap_data.size <= HEATMAP_TEXT_MAX_CELLS
+    text_args = dict(text=heatmap_data.values, texttemplate="%{text:.1f}", textfont={"size": 12, "color": "white" if dark_mode else "black"}) if show_text else {}
+
+    fig_heat = go.Figure(data=go.Heatmap(
+        z=heatmap_data.values, x=logic.DIMENSIONS, y=heatmap_data.index,
+        colorscale='Viridis', zmin=1, zmax=5,
+        colorbar=dict(title=colorbar_title),
+        **text_args
+    ))
+    fig_heat.update_layout(title=title, template=chart_template, height=dynamic_height, yaxis=dict(autorange="reversed"), paper_bgcolor=TRANSPARENT, plot_bgcolor=TRANSPARENT, font=dict(color=text_color))
+    return fig_heat
+
+@instrumentation.timed(measure=_measure_figure)
+def dimension_heatmap(df, chart_template, text_color, dark_mode):
+    """One heatmap row per assessment, one column per dimension."""
+    heatmap_data = df[['department'] + logic.SCORE_COLUMNS].set_index('department')
+    return _heatmap(heatmap_data, chart_template, text_color, dark_mode, "Dimension Heatmap", "Weighted Score")
+
+@instrumentation.timed(measure=_measure_figure)
+def summary_heatmap(summary, stat, chart_template, text_color, dark_mode):
+    """One heatmap row per department or unit from database.get_dimension_summary."""
+    label = "Mean" if stat == 'mean' else stat.title()
+    return _heatmap(summary[logic.SCORE_COLUMNS], chart_template, text_color, dark_mode, f"Dimension Heatmap ({label} per group)", f"{label} Score")
+
+@instrumentation.timed(measure=_measure_figure)
+def radar_profiles(df, chart_template, text_color):
+    """Overlaid radar traces, one per assessment row."""
+    fig_radar = go.Figure()
+    for _, row in df.iterrows():
+        fig_radar.add_trace(go.Scatterpolar(r=[row[col] for col in logic.SCORE_COLUMNS], theta=logic.DIMENSIONS, fill='toself', name=row['department']))
+    
+    fig_radar.update_layout(
+        polar=dict(radialaxis=dict(visible=True, range=[0, 5]), angularaxis=dict(tickfont=dict(size=14, color=text_color, family="Arial Black"))), 
+        showlegend=True, template=chart_template, paper_bgcolor=TRANSPARENT, plot_bgcolor=TRANSPARENT, font=dict(color=text_color)
+    )
+    return fig_radar
+
+@instrumentation.timed(measure=_measure_figure)
+def score_history(history, chart_template, text_color):
+    """Per-period dimension averages and Maturity Index for one department."""
+    fig_trend = go.Figure()
+    for col, name in zip(logic.SCORE_COLUMNS, logic.DIMENSIONS):
+        fig_trend.add_trace(go.Scatter(x=history['period'], y=history[col], mode='lines+markers', name=name))
+    fig_trend.add_trace(go.Scatter(x=history['period'], y=history['Maturity Index'], mode='lines+markers', name='Maturity Index', line=dict(width=4, dash='dash')))
+    fig_trend.update_layout(template=chart_template, paper_bgcolor=TRANSPARENT, plot_bgcolor=TRANSPARENT, font=dict(color=text_color), yaxis=dict(range=[0, 5], title="Average Score"), height=380, margin=dict(l=20, r=20, t=30, b=20))
+    return fig_trend
+
+@instrumentation.timed(measure=_measure_figure)
+def sensitivity(summary, metric, chart_template, text_color):
+    """One line per dimension: metric as that dimension alone is moved by each step (simulation.sensitivity output)."""
+    fig_sensitivity = go.Figure()
+    for dimension, rows in summary.groupby('Dimension', sort=False):
+        fig_sensitivity.add_trace(go.Scatter(x=rows['Step'], y=rows[metric], mode='lines+markers', name=dimension))
+    fig_sensitivity.add_vline(x=0, line_dash='dot', line_color=text_color, opacity=0.4)
+    fig_sensitivity.update_layout(template=chart_template, paper_bgcolor=TRANSPARENT, plot_bgcolor=TRANSPARENT, font=dict(color=text_color), xaxis_title="Change to one dimension (points)", yaxis_title=metric, height=380, margin=dict(l=20, r=20, t=30, b=20))
+    return fig_sensitivity
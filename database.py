@@ -1,22 +1,179 @@
+import atexit
+import itertools
+import queue
 import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from concurrent.futures import Future
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 import os
+import instrumentation
+import logic
 
-DB_NAME = 'maturity_platform.db'
+DB_NAME = os.environ.get('MATURITY_DB', 'maturity_platform.db')
+IMPORT_CHUNK_SIZE = 10000
+# Import chunks in flight in the write queue at once (bounds memory and the
+# wait of form submissions queued behind an import)
+IMPORT_WINDOW = 2
+# Rows grouped into one write transaction by the writer thread
+WRITE_BATCH_ROWS = 20000
 
-def init_db():
-    """Initialize the SQLite database and create tables if they don't exist."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
-    # Check if we need to migrate schema (simple check)
-    try:
-        c.execute("SELECT * FROM assessments LIMIT 1")
-    except sqlite3.OperationalError:
-        pass # Table likely doesn't exist or schema changed
+# Connection tuning
+POOL_SIZE = 8                   # idle connections kept open per database file
+BUSY_TIMEOUT_MS = 5000          # wait this long for a competing writer before "database is locked"
+CACHE_SIZE_KB = 20000           # page cache per connection (~20 MB)
+MMAP_SIZE = 256 * 1024 * 1024   # memory-map up to 256 MB of the database file
+
+# Re-check the table for writes from other processes at most this often (seconds)
+SNAPSHOT_CHECK_INTERVAL = 2.0
+# Rows per record batch in Parquet / Arrow snapshot files
+SNAPSHOT_BATCH_SIZE = 65536
+
+# CSV upload headers -> assessments table columns
+CSV_COLUMNS = {
+    'Department': 'department',
+    'Tech': 'tech_score',
+    'Culture': 'culture_score',
+    'Process': 'process_score',
+    'Skills': 'skills_score',
+    'Risk': 'risk_score',
+}
+SCORE_COLUMNS = ['tech_score', 'culture_score', 'process_score', 'skills_score', 'risk_score']
+
+ASSESSMENT_COLUMNS = ['id', 'department'] + SCORE_COLUMNS + ['timestamp']
+SELECT_COLUMNS = ', '.join(ASSESSMENT_COLUMNS)
+
+# Dtype contract of every assessment frame returned by this module. Department
+# categories are sorted by name, scores are float32 (use logic.widen_scores for
+# exact decimals), 'Maturity Index' when present is float64 and 'Maturity
+# Label' an ordered category of logic.MATURITY_LABELS.
+ASSESSMENT_DTYPES = {
+    'id': 'int64',
+    'department': 'category',
+    **{col: 'float32' for col in SCORE_COLUMNS},
+    'timestamp': 'datetime64[s]',
+}
+LABEL_DTYPE = pd.CategoricalDtype(logic.MATURITY_LABELS, ordered=True)
+
+# SQL twin of logic.calculate_maturity_index (same left-to-right sum, so same values)
+MATURITY_INDEX_SQL = '(' + ' + '.join(SCORE_COLUMNS) + f') / {float(len(SCORE_COLUMNS))}'
+
+def _label_case_sql(expr):
+    """SQL CASE expression equivalent to logic.get_label (NULL maps to the lowest level)."""
+    whens = ' '.join(
+        f"WHEN {expr} >= {threshold} THEN '{label}'"
+        for threshold, label in reversed(list(zip(logic.LABEL_THRESHOLDS, logic.MATURITY_LABELS[1:])))
+    )
+    return f"CASE {whens} ELSE '{logic.MATURITY_LABELS[0]}' END"
+
+MATURITY_LABEL_SQL = _label_case_sql('maturity_index')
+
+INSERT_DEPARTMENT_SQL = "INSERT OR IGNORE INTO departments (name) VALUES (?)"
+INSERT_SQL = '''
+    INSERT INTO assessments (department_id, tech_score, culture_score, process_score, skills_score, risk_score)
+    VALUES ((SELECT id FROM departments WHERE name = ?), ?, ?, ?, ?, ?)
+'''
+
+class ConnectionPool:
+    """
+    A small pool of tuned SQLite connections for one database file.
+    Streamlit runs every rerun on its own thread, so connections are borrowed
+    for the duration of a call and handed back instead of being tied to a thread.
+    """
+    def __init__(self, path, max_size=POOL_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        # WAL lets Dashboard readers run while the Assessment form / imports write
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it is returned to the pool (or closed) afterwards."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection pool has been closed")
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+
+        try:
+            yield conn
+        finally:
+            # Never hand out a connection with a half-finished transaction
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                keep = not self._closed and len(self._idle) < self.max_size
+                if keep:
+                    self._idle.append(conn)
+            if not keep:
+                conn.close()
+
+    def close(self):
+        """Close all idle connections and refuse new borrows."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """
+    Returns the pool for DB_NAME, creating (or replacing) it when needed.
+    A new pool brings the database schema up to date before first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_NAME:
+            if _pool is not None:
+                _pool.close()
+                invalidate_snapshot()
+            pool = ConnectionPool(DB_NAME)
+            with pool.connection() as conn:
+                migrate(conn)
+            _pool = pool
+        return _pool
+
+def get_connection():
+    """Context manager yielding a pooled connection to DB_NAME."""
+    return get_pool().connection()
+
+def close_connections():
+    """Close every pooled connection. Registered to run at interpreter shutdown."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
 
-    # Create assessments table
-    c.execute('''
+atexit.register(close_connections)
+
+# --- SCHEMA MIGRATIONS ---
+# Each migration takes a connection inside an open transaction. The number of
+# applied migrations is stored in PRAGMA user_version; append new ones at the end.
+
+def _migration_1_assessments(conn):
+    """Base assessments table with the generated Maturity Index column."""
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS assessments (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             department TEXT NOT NULL,
@@ -28,45 +185,1104 @@ def init_db():
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
-    conn.commit()
-    conn.close()
 
+    # Databases created before versioning may lack the generated column
+    columns = [info[1] for info in conn.execute("PRAGMA table_xinfo(assessments)")]
+    if 'maturity_index' not in columns:
+        conn.execute(f"ALTER TABLE assessments ADD COLUMN maturity_index REAL GENERATED ALWAYS AS ({MATURITY_INDEX_SQL}) VIRTUAL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_assessments_maturity_index ON assessments(maturity_index)")
+
+def _migration_2_departments(conn):
+    """
+    Moves department names into their own table and rebuilds assessments
+    around an integer department_id, with a stored Maturity Index.
+    Readers use the assessment_details view to get names back. Columns this
+    module does not know (e.g. raw_data in older databases) are carried
+    over unchanged.
+    """
+    known = {'id', 'department', 'timestamp', 'maturity_index', *SCORE_COLUMNS}
+    extra = [(info[1], info[2]) for info in conn.execute("PRAGMA table_xinfo(assessments)")
+             if info[1] not in known and info[6] == 0]  # hidden != 0: generated columns
+    extra_names = ''.join(f', "{name}"' for name, _ in extra)
+    extra_values = ''.join(f', a."{name}"' for name, _ in extra)
+
+    conn.execute('''
+        CREATE TABLE departments (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute("INSERT INTO departments (name) SELECT department FROM assessments GROUP BY department ORDER BY MIN(id)")
+
+    conn.execute(f'''
+        CREATE TABLE assessments_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            department_id INTEGER NOT NULL REFERENCES departments(id),
+            tech_score REAL,
+            culture_score REAL,
+            process_score REAL,
+            skills_score REAL,
+            risk_score REAL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            maturity_index REAL GENERATED ALWAYS AS ({MATURITY_INDEX_SQL}) STORED
+            {''.join(f', "{name}" {declared}' for name, declared in extra)}
+        )
+    ''')
+    conn.execute(f'''
+        INSERT INTO assessments_new (id, department_id, tech_score, culture_score, process_score, skills_score, risk_score, timestamp{extra_names})
+        SELECT a.id, d.id, a.tech_score, a.culture_score, a.process_score, a.skills_score, a.risk_score, a.timestamp{extra_values}
+        FROM assessments a JOIN departments d ON d.name = a.department
+    ''')
+
+    # Keep the AUTOINCREMENT counter so ids of deleted rows are never reused
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'assessments'").fetchone()
+    old_seq = row[0] if row else 0
+    conn.execute("DROP TABLE assessments")
+    conn.execute("ALTER TABLE assessments_new RENAME TO assessments")
+    if conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'assessments'").fetchone():
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'assessments'", (old_seq,))
+    elif old_seq:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('assessments', ?)", (old_seq,))
+
+    conn.execute("CREATE INDEX idx_assessments_department_timestamp ON assessments(department_id, timestamp)")
+    conn.execute("CREATE INDEX idx_assessments_maturity_index ON assessments(maturity_index)")
+    conn.execute(f'''
+        CREATE VIEW assessment_details AS
+        SELECT a.id, d.name AS department, {', '.join('a.' + col for col in SCORE_COLUMNS)},
+               a.timestamp, a.maturity_index, a.department_id
+        FROM assessments a JOIN departments d ON d.id = a.department_id
+    ''')
+
+def _migration_3_import_period(conn):
+    """
+    Natural key for idempotent imports: rows saved by upsert_assessments
+    carry the period they belong to, and a department has at most one such
+    row per period. Appended rows (the Assessment form) keep period NULL.
+    """
+    conn.execute("ALTER TABLE assessments ADD COLUMN period TEXT")
+    conn.execute('''
+        CREATE UNIQUE INDEX idx_assessments_department_period
+        ON assessments(department_id, period) WHERE period IS NOT NULL
+    ''')
+    # Updated rows leave (max id, row count) alone, so caches also compare this counter
+    conn.execute("CREATE TABLE assessment_updates (id INTEGER PRIMARY KEY CHECK (id = 1), count INTEGER NOT NULL)")
+    conn.execute("INSERT INTO assessment_updates (id, count) VALUES (1, 0)")
+    conn.execute('''
+        CREATE TRIGGER assessments_updated AFTER UPDATE ON assessments
+        BEGIN
+            UPDATE assessment_updates SET count = count + 1 WHERE id = 1;
+        END
+    ''')
+
+# Columns rolled up per department in department_summary
+ROLLUP_COLUMNS = SCORE_COLUMNS + ['maturity_index']
+ROLLUP_STATS = ', '.join(f"sum_{col}, n_{col}, min_{col}, max_{col}" for col in ROLLUP_COLUMNS)
+ROLLUP_AGGREGATES = ', '.join(f"TOTAL({col}), COUNT({col}), MIN({col}), MAX({col})" for col in ROLLUP_COLUMNS)
+ROLLUP_LATEST = ['id', 'timestamp'] + ROLLUP_COLUMNS
+
+def _migration_4_department_summary(conn):
+    """
+    department_summary: one row per department with its assessment count,
+    running sums (and non-NULL counts), minimum and maximum of every score
+    and of the Maturity Index, plus its latest assessment. The write
+    functions of this module keep it up to date (see _fold_new_rows and
+    _refresh_summary), so per-department views read it instead of the
+    full history.
+    """
+    stats = ', '.join(f"sum_{col} REAL NOT NULL DEFAULT 0, n_{col} INTEGER NOT NULL DEFAULT 0, min_{col} REAL, max_{col} REAL"
+                      for col in ROLLUP_COLUMNS)
+    latest = ', '.join(f"latest_{col} REAL" for col in ROLLUP_COLUMNS)
+    conn.execute(f'''
+        CREATE TABLE department_summary (
+            department_id INTEGER PRIMARY KEY REFERENCES departments(id),
+            assessments INTEGER NOT NULL,
+            {stats},
+            latest_id INTEGER,
+            latest_timestamp DATETIME,
+            {latest}
+        )
+    ''')
+    _refresh_summary(conn, "SELECT id FROM departments")
+
+MIGRATIONS = [
+    _migration_1_assessments,
+    _migration_2_departments,
+    _migration_3_import_period,
+    _migration_4_department_summary,
+]
+
+def get_schema_version(conn):
+    """Number of migrations applied to the database behind conn."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """
+    Apply pending migrations one at a time, each in its own write transaction.
+    The version is re-read after taking the write lock, so concurrent
+    processes starting up at the same time never apply a migration twice.
+    """
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(conn)
+            if version >= len(MIGRATIONS):
+                conn.commit()
+                return version
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def init_db():
+    """Initialize the SQLite database and bring its schema up to date."""
+    with get_connection() as conn:
+        migrate(conn)
+
+# --- SINGLE-WRITER QUEUE ---
+# All writes of this process run on one background thread with its own
+# connection, so form submissions and import chunks queue up behind each
+# other instead of competing for SQLite's write lock.
+
+class _WriteJob:
+    __slots__ = ('func', 'args', 'rows', 'bulk', 'future')
+
+    def __init__(self, func, args, rows, bulk):
+        self.func = func
+        self.args = args
+        self.rows = rows
+        self.bulk = bulk
+        self.future = Future()
+
+_STOP = object()
+
+class WriteQueue:
+    """
+    Single writer thread for one ConnectionPool. submit(func, *args) queues
+    func(conn, *args) and returns a Future of its result. Waiting jobs are
+    grouped into one transaction (up to WRITE_BATCH_ROWS rows), interactive
+    jobs ahead of and apart from bulk ones. Barrier jobs run strictly in
+    submission order. Each job runs in its own savepoint, so a failing job
+    is rolled back and reported on its Future without affecting the rest
+    of the batch.
+    """
+    def __init__(self, pool):
+        self.pool = pool
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._barriers = 0
+        self._thread = threading.Thread(target=self._run, name='maturity-db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, rows=1, bulk=False, barrier=False):
+        """
+        Queue func(conn, *args) for the writer thread; rows sizes the batch.
+        A barrier job (e.g. clearing the table) runs after every job queued
+        before it, bulk import chunks included, and before every job queued
+        after it.
+        """
+        job = _WriteJob(func, args, rows, bulk or barrier)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Write queue has been closed")
+            # While a barrier waits, interactive jobs queue behind it in order
+            priority = 1 if bulk or barrier or self._barriers else 0
+            if barrier:
+                self._barriers += 1
+                job.future.add_done_callback(self._barrier_done)
+            self._queue.put((priority, next(self._order), job))
+        return job.future
+
+    def _barrier_done(self, future):
+        with self._lock:
+            self._barriers -= 1
+
+    def close(self):
+        """Finish every queued write, then stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put((2, next(self._order), _STOP))
+        self._thread.join()
+
+    def _run(self):
+        with self.pool.connection() as conn:
+            carry = None
+            while True:
+                job = carry or self._queue.get()[2]
+                carry = None
+                if job is _STOP:
+                    return
+                batch, rows = [job], job.rows
+                while rows < WRITE_BATCH_ROWS:
+                    try:
+                        job = self._queue.get_nowait()[2]
+                    except queue.Empty:
+                        break
+                    # Interactive jobs never wait for a bulk job's rows to be written
+                    if job is _STOP or job.bulk != batch[0].bulk or rows + job.rows > WRITE_BATCH_ROWS:
+                        carry = job
+                        break
+                    batch.append(job)
+                    rows += job.rows
+                self._execute(conn, batch)
+
+    def _execute(self, conn, batch):
+        batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job in batch:
+                conn.execute("SAVEPOINT write_job")
+                try:
+                    outcomes.append((True, job.func(conn, *job.args)))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_job")
+                    outcomes.append((False, e))
+                conn.execute("RELEASE write_job")
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for job in batch:
+                job.future.set_exception(e)
+            return
+
+        mark_snapshot_stale()
+        for job, (ok, value) in zip(batch, outcomes):
+            if ok:
+                job.future.set_result(value)
+            else:
+                job.future.set_exception(value)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """The WriteQueue for the current pool, started on first use."""
+    global _writer
+    pool = get_pool()
+    with _writer_lock:
+        if _writer is None or _writer.pool is not pool:
+            if _writer is not None:
+                _writer.close()
+            _writer = WriteQueue(pool)
+        return _writer
+
+def flush_writes():
+    """Wait for every queued write to commit and stop the writer. Registered to run at shutdown."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+
+# Runs before close_connections (atexit is last-in, first-out)
+atexit.register(flush_writes)
+
+def _wait_in_order(futures, limit, on_result):
+    """Resolve the oldest futures until at most limit are pending; on a failure, cancel the rest and raise."""
+    while len(futures) > limit:
+        try:
+            on_result(futures[0].result())
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        futures.popleft()
+
+# --- DEPARTMENT SUMMARY ---
+# The write functions below keep department_summary up to date inside their
+# own transaction: new rows are folded into the running totals, departments
+# whose rows were updated or deleted are recomputed from their rows.
+
+ROLLUP_FOLD = ', '.join(
+    f"sum_{col} = sum_{col} + excluded.sum_{col}, n_{col} = n_{col} + excluded.n_{col}, "
+    f"min_{col} = COALESCE(MIN(min_{col}, excluded.min_{col}), min_{col}, excluded.min_{col}), "
+    f"max_{col} = COALESCE(MAX(max_{col}, excluded.max_{col}), max_{col}, excluded.max_{col})"
+    for col in ROLLUP_COLUMNS
+)
+# The unary + keeps SQLite on the id range of the new rows; otherwise it
+# scans the whole (department_id, timestamp) index to avoid sorting.
+FOLD_SUMMARY_SQL = f'''
+    INSERT INTO department_summary (department_id, assessments, {ROLLUP_STATS})
+    SELECT department_id, COUNT(*), {ROLLUP_AGGREGATES} FROM assessments
+    WHERE id > ? GROUP BY +department_id
+    ON CONFLICT (department_id) DO UPDATE SET assessments = assessments + excluded.assessments, {ROLLUP_FOLD}
+'''
+
+def _latest_sql(departments):
+    """Statement copying the latest assessment (as in load_latest_assessments) into the departments' summaries."""
+    return f'''
+        UPDATE department_summary SET ({', '.join('latest_' + col for col in ROLLUP_LATEST)}) = (
+            SELECT {', '.join(ROLLUP_LATEST)} FROM assessments
+            WHERE department_id = department_summary.department_id
+            ORDER BY timestamp DESC, id DESC LIMIT 1
+        )
+        WHERE department_id IN ({departments})
+    '''
+
+def _fold_new_rows(conn, after_id):
+    """Add the assessments with id > after_id to their departments' summaries."""
+    conn.execute(FOLD_SUMMARY_SQL, (after_id,))
+    conn.execute(_latest_sql("SELECT department_id FROM assessments WHERE id > ?"), (after_id,))
+
+def _refresh_summary(conn, departments):
+    """
+    Recompute the summaries of the department ids selected by the
+    departments subquery from their rows; departments without rows lose
+    their summary.
+    """
+    conn.execute(f"DELETE FROM department_summary WHERE department_id IN ({departments})")
+    conn.execute(f'''
+        INSERT INTO department_summary (department_id, assessments, {ROLLUP_STATS})
+        SELECT department_id, COUNT(*), {ROLLUP_AGGREGATES} FROM assessments
+        WHERE department_id IN ({departments}) GROUP BY department_id
+    ''')
+    conn.execute(_latest_sql(departments))
+
+def _refresh_departments(conn, department_ids):
+    """_refresh_summary for a collection of department ids."""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS refresh_departments (id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT OR IGNORE INTO temp.refresh_departments (id) VALUES (?)", ((i,) for i in department_ids))
+    _refresh_summary(conn, "SELECT id FROM temp.refresh_departments")
+    conn.execute("DELETE FROM temp.refresh_departments")
+
+@instrumentation.timed()
+def rebuild_department_summary():
+    """
+    Recompute department_summary from the assessments table, e.g. after
+    rows were changed with SQL outside this module.
+    """
+    get_writer().submit(_refresh_summary, "SELECT id FROM departments").result()
+
+def _max_id(conn):
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM assessments").fetchone()[0]
+
+def _insert_assessments(conn, rows):
+    """Insert (department, tech, culture, process, skills, risk) tuples, registering new departments."""
+    rows = list(rows)
+    after_id = _max_id(conn)
+    conn.executemany(INSERT_DEPARTMENT_SQL, ((name,) for name in dict.fromkeys(row[0] for row in rows)))
+    conn.executemany(INSERT_SQL, rows)
+    _fold_new_rows(conn, after_id)
+
+def submit_assessment(department, tech, culture, process, skills, risk):
+    """Queue a single assessment; returns a Future that resolves once it is committed."""
+    return get_writer().submit(_insert_assessments, [(department, tech, culture, process, skills, risk)])
+
+@instrumentation.timed()
 def save_assessment(department, tech, culture, process, skills, risk):
-    """Save a single assessment result."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
-    c.execute('''
-        INSERT INTO assessments (department, tech_score, culture_score, process_score, skills_score, risk_score)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (department, tech, culture, process, skills, risk))
-    
-    conn.commit()
-    conn.close()
+    """Save a single assessment result, waiting until it is committed."""
+    submit_assessment(department, tech, culture, process, skills, risk).result()
 
-def load_data():
-    """Load all assessment data into a Pandas DataFrame."""
-    conn = sqlite3.connect(DB_NAME)
+def _iter_chunks(data, chunksize):
+    if isinstance(data, pd.DataFrame):
+        return (data.iloc[start:start + chunksize] for start in range(0, len(data), chunksize))
+    return data
+
+def score_values(series):
+    """
+    float64 array of an uploaded score column. float32 columns (e.g. from an
+    export_snapshot file) are widened with logic.widen_scores, so 4.2 is
+    stored as 4.2 rather than 4.199999809265137.
+    """
+    if series.dtype == np.float32:
+        return logic.widen_scores(series.to_numpy())
+    return series.astype('float64').to_numpy()
+
+def _chunk_rows(chunk):
+    """(department, tech, culture, process, skills, risk) tuples of a chunk with CSV headers or table columns."""
+    chunk = chunk.rename(columns=CSV_COLUMNS)
+    return zip(
+        chunk['department'].astype(str),
+        *(score_values(chunk[col]) for col in SCORE_COLUMNS)
+    )
+
+@instrumentation.timed()
+def bulk_save_assessments(data, chunksize=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Save many assessments at once.
+    Accepts a DataFrame or an iterator of DataFrame chunks (e.g. from
+    pd.read_csv(..., chunksize=n)) using either the CSV headers or the table
+    column names. Chunks go through the write queue, at most IMPORT_WINDOW
+    at a time, so other writers are interleaved between them;
+    progress(rows_saved) is called after every chunk commits.
+    Returns the number of rows saved.
+    """
+    writer = get_writer()
+    pending = deque()
+    total = 0
+
+    def saved(rows):
+        nonlocal total
+        total += rows
+        if progress is not None:
+            progress(total)
+
+    for chunk in _iter_chunks(data, chunksize):
+        rows = list(_chunk_rows(chunk))
+        pending.append(writer.submit(_insert_chunk, rows, rows=len(rows), bulk=True))
+        _wait_in_order(pending, IMPORT_WINDOW - 1, saved)
+    _wait_in_order(pending, 0, saved)
+    return total
+
+def _insert_chunk(conn, rows):
+    _insert_assessments(conn, rows)
+    return len(rows)
+
+# Granularity of the (department, period) key used by upsert_assessments
+UPSERT_PERIOD = 'month'
+
+UPSERT_SQL = f'''
+    INSERT INTO assessments (department_id, {', '.join(SCORE_COLUMNS)}, period, timestamp)
+    VALUES ((SELECT id FROM departments WHERE name = ?), ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+    ON CONFLICT (department_id, period) WHERE period IS NOT NULL DO UPDATE SET
+        {', '.join(f'{col} = excluded.{col}' for col in SCORE_COLUMNS)},
+        timestamp = excluded.timestamp
+    WHERE ({', '.join(SCORE_COLUMNS)}) IS NOT ({', '.join('excluded.' + col for col in SCORE_COLUMNS)})
+'''
+
+def current_period(period=UPSERT_PERIOD):
+    """Key of the current day, week or month, e.g. '2024-05-01' for May 2024."""
+    if period not in HISTORY_PERIODS:
+        raise ValueError(f"period must be one of {list(HISTORY_PERIODS)}")
+    with get_connection() as conn:
+        return conn.execute(f"SELECT {HISTORY_PERIODS[period]} FROM (SELECT CURRENT_TIMESTAMP AS timestamp)").fetchone()[0]
+
+def check_period(period):
+    """
+    Returns period if it is an upsert period key (the first day of a month,
+    e.g. '2024-05-01', as produced by current_period()); raises ValueError otherwise.
+    """
     try:
-        df = pd.read_sql_query("SELECT * FROM assessments", conn)
-        return df
-    except:
-        return pd.DataFrame()
-    finally:
-        conn.close()
+        valid = datetime.strptime(period, '%Y-%m-%d').strftime('%Y-%m-01') == period
+    except (TypeError, ValueError):
+        valid = False
+    if not valid:
+        raise ValueError(f"Period must be the first day of a month as YYYY-MM-01, got {period!r}")
+    return period
+
+@instrumentation.timed()
+def upsert_assessments(data, period=None, chunksize=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Idempotent version of bulk_save_assessments, keyed on (department,
+    period): a department's first row in the period is inserted, rows from
+    later imports replace its scores and rows with unchanged scores are
+    skipped, so re-sending the same extract changes nothing. period
+    defaults to current_period(). Only the first row of each department in
+    data is applied; repeats within the same upload are counted as
+    'repeated' instead of silently replacing it. Chunks go through the
+    write queue like bulk_save_assessments.
+    Rows of the current period are timestamped with the import time; rows
+    backfilled into an earlier (or later) period get the period's first
+    day, so history and latest-assessment views place them in that month.
+    Returns a dict with 'inserted', 'updated', 'skipped' and 'repeated' counts.
+    """
+    current = current_period()
+    period = current if period is None else check_period(period)
+    stamp = None if period == current else f"{period} 00:00:00"
+    writer = get_writer()
+    pending = deque()
+    summary = {'inserted': 0, 'updated': 0, 'skipped': 0, 'repeated': 0}
+    seen = set()
+    total = 0
+
+    def saved(counts):
+        nonlocal total
+        for key, count in counts.items():
+            summary[key] += count
+        total += sum(counts.values())
+        if progress is not None:
+            progress(total)
+
+    for chunk in _iter_chunks(data, chunksize):
+        rows = []
+        for row in _chunk_rows(chunk):
+            if row[0] in seen:
+                summary['repeated'] += 1
+            else:
+                seen.add(row[0])
+                rows.append(row)
+        if rows:
+            pending.append(writer.submit(_upsert_chunk, rows, period, stamp, rows=len(rows), bulk=True))
+        _wait_in_order(pending, IMPORT_WINDOW - 1, saved)
+    _wait_in_order(pending, 0, saved)
+    return summary
+
+def _upsert_chunk(conn, rows, period, stamp):
+    names = list(dict.fromkeys(row[0] for row in rows))
+    conn.executemany(INSERT_DEPARTMENT_SQL, ((name,) for name in names))
+    max_id, updates = conn.execute(
+        "SELECT COALESCE(MAX(id), 0), (SELECT count FROM assessment_updates) FROM assessments"
+    ).fetchone()
+    conn.executemany(UPSERT_SQL, (row + (period, stamp) for row in rows))
+    inserted, updated = conn.execute(
+        "SELECT COUNT(*), (SELECT count FROM assessment_updates) - ? FROM assessments WHERE id > ?",
+        (updates, max_id),
+    ).fetchone()
+    if updated:
+        # Scores replaced in place: recompute the summaries of the chunk's departments
+        _refresh_departments(conn, [
+            row[0] for name in names for row in conn.execute("SELECT id FROM departments WHERE name = ?", (name,))
+        ])
+    else:
+        _fold_new_rows(conn, max_id)
+    return {'inserted': inserted, 'updated': updated, 'skipped': len(rows) - inserted - updated}
+
+def _delete_duplicates(conn, period):
+    duplicates = conn.execute(f'''
+        SELECT id, department_id FROM (
+            SELECT id, department_id, ROW_NUMBER() OVER (
+                PARTITION BY department_id, period, {', '.join(SCORE_COLUMNS)}, {HISTORY_PERIODS[period]}
+                ORDER BY id
+            ) AS rn
+            FROM assessments
+        )
+        WHERE rn > 1
+    ''').fetchall()
+    conn.executemany("DELETE FROM assessments WHERE id = ?", ((row[0],) for row in duplicates))
+    _refresh_departments(conn, {row[1] for row in duplicates})
+    return len(duplicates)
+
+@instrumentation.timed()
+def compact_assessments(period='month'):
+    """
+    Removes duplicate appended assessments: rows of the same department
+    with identical scores in the same day, week or month. The first row of
+    each group is kept. Rows saved by upsert_assessments are already unique
+    per department and period and are never removed, so a period imported
+    twice with the same scores keeps both. Returns the number of rows removed.
+    """
+    if period not in HISTORY_PERIODS:
+        raise ValueError(f"period must be one of {list(HISTORY_PERIODS)}")
+    removed = get_writer().submit(_delete_duplicates, period, barrier=True).result()
+    if removed:
+        invalidate_snapshot()
+    return removed
+
+def assessment_frame(df):
+    """Cast a frame read from assessment_details to ASSESSMENT_DTYPES (other columns are kept)."""
+    df = df.astype({col: dtype for col, dtype in ASSESSMENT_DTYPES.items() if col in df and col != 'timestamp'})
+    if 'timestamp' in df:
+        df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce').astype('datetime64[s]')
+    return df
+
+@instrumentation.timed()
+def load_data():
+    """Load all assessment data into a Pandas DataFrame (see ASSESSMENT_DTYPES)."""
+    with get_connection() as conn:
+        try:
+            df = pd.read_sql_query(f"SELECT {SELECT_COLUMNS} FROM assessment_details ORDER BY id", conn)
+            return assessment_frame(df)
+        except:
+            return pd.DataFrame()
+
+def iter_assessments(chunksize=IMPORT_CHUNK_SIZE):
+    """Yield the assessments table in DataFrame chunks, oldest first, without loading it all at once."""
+    with get_connection() as conn:
+        for chunk in pd.read_sql_query(f"SELECT {SELECT_COLUMNS} FROM assessment_details ORDER BY id", conn, chunksize=chunksize):
+            yield assessment_frame(chunk)
+
+@instrumentation.timed()
+def load_departments(names):
+    """
+    Load the assessments of the given departments, using the
+    (department_id, timestamp) index instead of filtering the full table.
+    """
+    names = list(names)
+    placeholders = ', '.join('?' * len(names))
+    with get_connection() as conn:
+        return assessment_frame(pd.read_sql_query(f'''
+            SELECT {SELECT_COLUMNS} FROM assessment_details
+            WHERE department_id IN (SELECT id FROM departments WHERE name IN ({placeholders}))
+            ORDER BY id
+        ''', conn, params=names))
+
+HISTORY_PERIODS = {
+    'day': "date(timestamp)",
+    'week': "date(timestamp, 'weekday 0', '-6 days')",  # Monday starting the week
+    'month': "date(timestamp, 'start of month')",
+}
+
+@instrumentation.timed()
+def load_latest_assessments(names=None):
+    """
+    Latest assessment of every department (or only of the given names),
+    read from department_summary. Ties on timestamp go to the newest id.
+    """
+    params = []
+    where = ''
+    if names is not None:
+        params = list(names)
+        where = f"WHERE d.name IN ({', '.join('?' * len(params))})"
+    latest = ', '.join(f"s.latest_{col} AS {col}" for col in SCORE_COLUMNS)
+    with get_connection() as conn:
+        return assessment_frame(pd.read_sql_query(f'''
+            SELECT s.latest_id AS id, d.name AS department, {latest}, s.latest_timestamp AS timestamp
+            FROM department_summary s JOIN departments d ON d.id = s.department_id
+            {where}
+            ORDER BY s.department_id
+        ''', conn, params=params))
+
+@instrumentation.timed()
+def load_department_history(name, period='month'):
+    """
+    Average scores and Maturity Index of one department per day, week or
+    month, oldest first, for trend charts.
+    """
+    if period not in HISTORY_PERIODS:
+        raise ValueError(f"period must be one of {list(HISTORY_PERIODS)}")
+    averages = ', '.join(f"AVG({col}) AS {col}" for col in SCORE_COLUMNS)
+    with get_connection() as conn:
+        return pd.read_sql_query(f'''
+            SELECT {HISTORY_PERIODS[period]} AS period, COUNT(*) AS assessments,
+                   {averages}, AVG(maturity_index) AS "Maturity Index"
+            FROM assessments
+            WHERE department_id = (SELECT id FROM departments WHERE name = ?)
+            GROUP BY period
+            ORDER BY period
+        ''', conn, params=(name,), parse_dates=['period'])
+
+# Heatmap statistics: None means the mean, otherwise the quantile to report
+SUMMARY_STATS = {'mean': None, 'median': 0.5, 'p25': 0.25, 'p75': 0.75, 'p90': 0.9}
+
+def _department_names(conn):
+    """Department names indexed by department id, in first-assessed order."""
+    return pd.Series(dict(conn.execute("SELECT id, name FROM departments ORDER BY id")), dtype=object)
+
+def _grouped_quantile(codes, values, n_groups, quantile):
+    """Nearest-rank quantile of values within each group code (NaN where a group has no values)."""
+    valid = ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+    order = np.lexsort((values, codes))
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    ranks = np.maximum(np.ceil(quantile * counts).astype(np.int64) - 1, 0)
+    result = np.full(n_groups, np.nan)
+    present = counts > 0
+    result[present] = values[order][starts[present] + ranks[present]]
+    return result
+
+@instrumentation.timed()
+def get_dimension_summary(stat='mean', group=None):
+    """
+    One row per department with the mean or a percentile of every dimension,
+    plus the number of assessments. group optionally maps a department name
+    to a coarser label (e.g. logic.department_unit) to roll departments up.
+    The result is sized by the number of departments, not assessments: means
+    come from the running sums in department_summary, percentiles (nearest
+    rank) from the bare score columns with array sorts.
+    """
+    if stat not in SUMMARY_STATS:
+        raise ValueError(f"stat must be one of {list(SUMMARY_STATS)}")
+    quantile = SUMMARY_STATS[stat]
+
+    with get_connection() as conn:
+        names = _department_names(conn)
+        if quantile is None:
+            sums = ', '.join(f"sum_{col} AS {col}, n_{col}" for col in SCORE_COLUMNS)
+            stats = pd.read_sql_query(f"""
+                SELECT department_id, assessments, {sums}
+                FROM department_summary ORDER BY department_id
+            """, conn)
+        else:
+            rows = conn.execute(f"SELECT department_id, {', '.join(SCORE_COLUMNS)} FROM assessments").fetchall()
+            scores = np.array(rows, dtype=float).reshape(-1, len(SCORE_COLUMNS) + 1)
+
+    if quantile is None:
+        stats['key'] = names.reindex(stats['department_id']).to_numpy()
+        if group is not None:
+            stats['key'] = stats['key'].map(group)
+        sums = stats.drop(columns='department_id').groupby('key', sort=False).sum()
+        summary = pd.DataFrame({col: sums[col] / sums[f'n_{col}'] for col in SCORE_COLUMNS})
+        summary.insert(0, 'assessments', sums['assessments'])
+        return summary.rename_axis(index=None)
+
+    # Department id -> group code, keeping first-assessed order
+    keys = names if group is None else names.map(group)
+    key_codes, key_labels = pd.factorize(keys, sort=False)
+    code_of_department = pd.Series(key_codes, index=names.index)
+    codes = code_of_department.reindex(scores[:, 0].astype(np.int64)).to_numpy()
 
+    summary = pd.DataFrame(
+        {col: _grouped_quantile(codes, scores[:, j + 1], len(key_labels), quantile) for j, col in enumerate(SCORE_COLUMNS)},
+        index=key_labels,
+    )
+    summary.insert(0, 'assessments', np.bincount(codes, minlength=len(key_labels)))
+    return summary[summary['assessments'] > 0]
+
+def _label_range(label):
+    """Maturity Index bounds [low, high) of a maturity level (None = unbounded)."""
+    level = logic.MATURITY_LABELS.index(label)
+    bounds = [None] + [float(t) for t in logic.LABEL_THRESHOLDS] + [None]
+    return bounds[level], bounds[level + 1]
+
+@instrumentation.timed()
+def get_assessment_page(cursor=None, page_size=25, descending=True, department_contains=None, label=None):
+    """
+    One page of assessments ordered by Maturity Index (ties by id), using
+    keyset pagination: cursor is the (maturity_index, id) of the last row of
+    the previous page, or None for the first page. Department substring and
+    maturity level filters are applied in SQL.
+    Returns (page DataFrame, cursor for the next page or None on the last page).
+    """
+    conditions = ["maturity_index IS NOT NULL"]
+    params = []
+    if department_contains:
+        escaped = department_contains.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append("department_id IN (SELECT id FROM departments WHERE name LIKE ? ESCAPE '\\')")
+        params.append(f"%{escaped}%")
+    if label:
+        low, high = _label_range(label)
+        if low is not None:
+            conditions.append("maturity_index >= ?")
+            params.append(low)
+        if high is not None:
+            conditions.append("maturity_index < ?")
+            params.append(high)
+    if cursor is not None:
+        conditions.append(f"(maturity_index, id) {'<' if descending else '>'} (?, ?)")
+        params.extend(cursor)
+
+    direction = 'DESC' if descending else 'ASC'
+    with get_connection() as conn:
+        df = pd.read_sql_query(f'''
+            SELECT {SELECT_COLUMNS}, maturity_index AS "Maturity Index", {MATURITY_LABEL_SQL} AS "Maturity Label"
+            FROM assessment_details
+            WHERE {' AND '.join(conditions)}
+            ORDER BY maturity_index {direction}, id {direction}
+            LIMIT ?
+        ''', conn, params=params + [page_size + 1])
+    df = assessment_frame(df)
+    df['Maturity Label'] = df['Maturity Label'].astype(LABEL_DTYPE)
+
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        last = df.iloc[-1]
+        next_cursor = (float(last['Maturity Index']), int(last['id']))
+    return df, next_cursor
+
+@instrumentation.timed()
+def get_departments():
+    """Names of the departments with assessments, in the order they were first assessed."""
+    with get_connection() as conn:
+        return [row[0] for row in conn.execute(
+            "SELECT d.name FROM department_summary s JOIN departments d ON d.id = s.department_id ORDER BY s.department_id"
+        )]
+
+def _delete_all(conn):
+    conn.execute("DELETE FROM department_summary")
+    conn.execute("DELETE FROM assessments")
+    conn.execute("DELETE FROM departments")
+
+@instrumentation.timed()
 def clear_data():
-    """Deletes all records from the assessments table."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+    """Deletes all records from the assessments and departments tables."""
     try:
-        c.execute("DELETE FROM assessments")
-        conn.commit()
+        get_writer().submit(_delete_all, barrier=True).result()
     except Exception as e:
         print(f"Error clearing data: {e}")
-    finally:
-        conn.close()
+    invalidate_snapshot()
+
+# --- COLUMNAR SNAPSHOTS (Parquet / Arrow IPC) ---
+# pyarrow is imported inside these functions so the rest of the module works without it.
+
+SNAPSHOT_FORMATS = {'.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow'}
+
+def snapshot_path():
+    """Default Arrow snapshot file, kept next to the database and used by load_snapshot()."""
+    return f"{DB_NAME}.arrow"
+
+def _snapshot_format(path, fmt=None):
+    fmt = fmt or SNAPSHOT_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in ('parquet', 'arrow'):
+        raise ValueError(f"Cannot tell snapshot format of '{path}'; use .parquet or .arrow")
+    return fmt
+
+def _arrow_schema(metadata=None):
+    import pyarrow as pa
+    return pa.schema([
+        ('id', pa.int64()),
+        ('department', pa.dictionary(pa.int32(), pa.string())),
+        *[(col, pa.float32()) for col in SCORE_COLUMNS],
+        ('timestamp', pa.timestamp('s')),
+        # Kept at full precision so labels match the database exactly
+        ('maturity_index', pa.float64()),
+    ], metadata=metadata)
+
+def _iter_record_batches(conn, schema, max_id, batch_size):
+    """Record batches of assessments with id <= max_id, sharing one department dictionary."""
+    import pyarrow as pa
+
+    departments = _department_names(conn)
+    dictionary = pa.array(departments.to_numpy(dtype=object), type=pa.string())
+    position = np.zeros(int(departments.index.max()) + 1 if len(departments) else 1, dtype=np.int32)
+    position[departments.index.to_numpy(dtype=np.int64)] = np.arange(len(departments), dtype=np.int32)
+
+    columns = ['id', 'department_id'] + SCORE_COLUMNS + ['timestamp', 'maturity_index']
+    cursor = conn.execute(f"SELECT {', '.join(columns)} FROM assessments WHERE id <= ? ORDER BY id", (max_id,))
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        chunk = pd.DataFrame.from_records(rows, columns=columns)
+        timestamps = pd.to_datetime(chunk['timestamp'], errors='coerce').to_numpy(dtype='datetime64[s]')
+        yield pa.RecordBatch.from_arrays([
+            pa.array(chunk['id'].to_numpy(dtype=np.int64)),
+            pa.DictionaryArray.from_arrays(pa.array(position[chunk['department_id'].to_numpy(dtype=np.int64)]), dictionary),
+            *[pa.array(chunk[col].astype('float32').to_numpy(), from_pandas=True) for col in SCORE_COLUMNS],
+            pa.array(timestamps, type=pa.timestamp('s'), from_pandas=True),
+            pa.array(chunk['maturity_index'].astype('float64').to_numpy(), from_pandas=True),
+        ], schema=schema)
+
+@instrumentation.timed()
+def export_snapshot(path=None, fmt=None, batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Write the assessments table to a Parquet or Arrow IPC file (format taken
+    from the extension unless fmt is given), streaming it in record batches.
+    Scores are float32 and departments dictionary-encoded. The file is
+    written next to its destination and renamed into place when complete.
+    Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = path or snapshot_path()
+    fmt = _snapshot_format(path, fmt)
+    tmp_path = f"{path}.tmp"
+    with get_connection() as conn:
+        # One read transaction so the metadata matches the rows written
+        conn.execute("BEGIN")
+        try:
+            max_id, row_count, updates = _table_state(conn)
+            schema = _arrow_schema({'max_id': str(max_id), 'row_count': str(row_count), 'updates': str(updates)})
+            batches = _iter_record_batches(conn, schema, max_id, batch_size)
+            if fmt == 'parquet':
+                with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+                    for batch in batches:
+                        writer.write_batch(batch)
+            else:
+                with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+                    for batch in batches:
+                        writer.write_batch(batch)
+        finally:
+            conn.rollback()
+    os.replace(tmp_path, path)
+    return row_count
+
+def load_arrow_snapshot(path=None):
+    """
+    Open an Arrow IPC snapshot through a memory map. Columns of the returned
+    pyarrow Table point straight into the mapped file (no copy, no parsing).
+    """
+    import pyarrow as pa
+    source = pa.memory_map(path or snapshot_path(), 'r')
+    return pa.ipc.open_file(source).read_all()
+
+def snapshot_frame(table):
+    """Convert a snapshot Table to a load_snapshot()-style DataFrame."""
+    df = table.to_pandas(split_blocks=True)
+    df['department'] = df['department'].cat.reorder_categories(sorted(df['department'].cat.categories))
+    df['Maturity Index'] = df.pop('maturity_index')
+    df['Maturity Label'] = logic.get_labels(df['Maturity Index'].to_numpy())
+    return df
+
+def iter_upload_chunks(source, fmt='csv', chunksize=IMPORT_CHUNK_SIZE, columns=None):
+    """
+    Yield DataFrame chunks of an uploaded CSV or Parquet file without reading
+    it whole. Parquet files written by export_snapshot (table column names)
+    are accepted in place of the CSV headers.
+    """
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(source)
+        if columns is not None:
+            available = set(parquet.schema_arrow.names)
+            columns = [col if col in available else CSV_COLUMNS.get(col, col) for col in columns]
+            missing = [col for col in columns if col not in available]
+            if missing:
+                raise ValueError(f"Parquet file is missing columns: {missing}")
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        # Department names stay text even when they look numeric
+        yield from pd.read_csv(source, usecols=columns, chunksize=chunksize, dtype={'Department': str})
+
+def _table_state(conn):
+    """(max id, row count, update count) of the assessments table; changes whenever its rows do."""
+    return conn.execute(
+        "SELECT (SELECT COALESCE(MAX(id), 0) FROM assessments), CAST(TOTAL(assessments) AS INTEGER), "
+        "(SELECT count FROM assessment_updates) FROM department_summary"
+    ).fetchone()
+
+def get_data_version():
+    """Value that changes whenever the assessments do, for caches kept outside this module."""
+    with get_connection() as conn:
+        return _table_state(conn)
+
+class AssessmentSnapshot:
+    """
+    Cached copy of the assessments table with the derived Maturity Index and
+    Maturity Label columns, keyed on the table's (max id, row count, update count).
+    """
+    def __init__(self, frame, max_id, row_count, updates):
+        self.frame = frame
+        self.max_id = max_id
+        self.row_count = row_count
+        self.updates = updates
+        self.stale = False
+        self.checked_at = time.monotonic()
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def mark_snapshot_stale():
+    """Forces the next load_snapshot() to look for new rows."""
+    snapshot = _snapshot
+    if snapshot is not None:
+        snapshot.stale = True
+
+def invalidate_snapshot():
+    """Discards the cached snapshot; the next load_snapshot() reloads everything."""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+
+def _read_assessments(conn, after_id=0):
+    """Assessments past after_id in the snapshot frame layout and dtypes."""
+    df = pd.read_sql_query(
+        f"SELECT {SELECT_COLUMNS}, maturity_index FROM assessment_details WHERE id > ? ORDER BY id",
+        conn, params=(after_id,))
+    df = assessment_frame(df)
+    df['Maturity Index'] = df.pop('maturity_index').astype('float64')
+    df['Maturity Label'] = logic.get_labels(df['Maturity Index'].to_numpy())
+    return df
+
+def _read_snapshot_file(conn):
+    """
+    Frame and high-water mark from the Arrow snapshot file, or None when
+    there is no usable file (missing, pyarrow not installed, or rows it
+    covers have since been deleted or updated).
+    """
+    path = snapshot_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        table = load_arrow_snapshot(path)
+    except ImportError:
+        return None
+    metadata = table.schema.metadata or {}
+    max_id = int(metadata.get(b'max_id', -1))
+    row_count = int(metadata.get(b'row_count', -1))
+    updates = int(metadata.get(b'updates', -1))
+    current = conn.execute(
+        "SELECT COUNT(*), (SELECT count FROM assessment_updates) FROM assessments WHERE id <= ?", (max_id,)
+    ).fetchone()
+    if current != (row_count, updates):
+        return None
+    return snapshot_frame(table), max_id
+
+def _append_frames(frame, new_rows):
+    """Concatenate snapshot frames, merging department categories instead of falling back to object."""
+    if new_rows.empty:
+        return frame
+    departments = pd.api.types.union_categoricals([frame['department'], new_rows['department']], sort_categories=True)
+    frame = pd.concat([frame.drop(columns='department'), new_rows.drop(columns='department')], ignore_index=True)
+    frame.insert(1, 'department', departments)
+    return frame
+
+@instrumentation.timed()
+def load_snapshot():
+    """
+    Load all assessments with 'Maturity Index' and 'Maturity Label' columns,
+    served from an in-process cache. When the table has grown only rows newer
+    than the cached high-water mark are fetched and scored; anything else
+    (deletes, updates by upsert_assessments, clear_data) triggers a full reload, which starts from the Arrow
+    snapshot file (see export_snapshot) when it is still valid.
+    Departments and labels are categorical and scores float32.
+    The returned DataFrame is shared between callers and must not be modified.
+    """
+    global _snapshot
+    with _snapshot_lock:
+        snapshot = _snapshot
+        if (snapshot is not None and not snapshot.stale
+                and time.monotonic() - snapshot.checked_at < SNAPSHOT_CHECK_INTERVAL):
+            return snapshot.frame
+
+        with get_connection() as conn:
+            max_id, row_count, updates = _table_state(conn)
+
+            if snapshot is not None and (max_id, row_count, updates) == (snapshot.max_id, snapshot.row_count, snapshot.updates):
+                snapshot.stale = False
+                snapshot.checked_at = time.monotonic()
+                return snapshot.frame
+
+            if (snapshot is not None and updates == snapshot.updates
+                    and max_id >= snapshot.max_id and row_count > snapshot.row_count):
+                new_rows = _read_assessments(conn, snapshot.max_id)
+                if snapshot.row_count + len(new_rows) == row_count:
+                    frame = _append_frames(snapshot.frame, new_rows)
+                    _snapshot = AssessmentSnapshot(frame, max_id, row_count, updates)
+                    return frame
+
+            # Cold load: start from the memory-mapped Arrow snapshot when one is usable
+            base = _read_snapshot_file(conn)
+            if base is not None:
+                frame = _append_frames(base[0], _read_assessments(conn, base[1]))
+            else:
+                frame = _read_assessments(conn)
+            _snapshot = AssessmentSnapshot(frame, max_id, row_count, updates)
+            return frame
+
+@instrumentation.timed()
+def get_kpis():
+    """
+    Dashboard KPIs computed inside SQLite: totals from department_summary,
+    the top department from the maturity_index index.
+    Returns a dict with 'total', 'avg_index' and 'top_department' (None when empty).
+    """
+    with get_connection() as conn:
+        total, avg_index = conn.execute(
+            "SELECT CAST(TOTAL(assessments) AS INTEGER), SUM(sum_maturity_index) / SUM(n_maturity_index) FROM department_summary"
+        ).fetchone()
+        top = conn.execute(
+            "SELECT department FROM assessment_details WHERE maturity_index IS NOT NULL "
+            "ORDER BY maturity_index DESC, id LIMIT 1"
+        ).fetchone()
+    return {'total': total, 'avg_index': avg_index, 'top_department': top[0] if top else None}
+
+@instrumentation.timed()
+def get_label_distribution():
+    """Number of assessments per maturity level, highest level first."""
+    with get_connection() as conn:
+        counts = dict(conn.execute(
+            f"SELECT {MATURITY_LABEL_SQL} AS label, COUNT(*) FROM assessments GROUP BY label"
+        ).fetchall())
+    label_order = logic.MATURITY_LABELS[::-1]
+    return pd.Series([counts.get(label, 0) for label in label_order], index=label_order, dtype='int64')
 
-# Initialize on import to ensure DB exists
-init_db()
\ No newline at end of file
+@instrumentation.timed()
+def get_rankings(top_n, ascending=False):
+    """
+    Top (or bottom, with ascending=True) top_n assessments by Maturity Index,
+    served from the maturity_index index instead of sorting the whole table.
+    """
+    direction = 'ASC' if ascending else 'DESC'
+    with get_connection() as conn:
+        df = pd.read_sql_query(f'''
+            SELECT department, maturity_index AS "Maturity Index", {MATURITY_LABEL_SQL} AS "Maturity Label"
+            FROM assessment_details
+            WHERE maturity_index IS NOT NULL
+            ORDER BY maturity_index {direction}, id {direction}
+            LIMIT ?
+        ''', conn, params=(int(top_n),))
+    df.insert(0, 'Rank', range(1, len(df) + 1))
+    return df
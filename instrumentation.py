@@ -0,0 +1,280 @@
+import functools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Fraction of traces recorded (0 disables instrumentation, 1 records everything).
+# A trace is one outermost span, e.g. a Streamlit rerun or one CLI command, and
+# is sampled as a whole so its nested spans are always complete.
+SAMPLE_RATE = float(os.environ.get('MATURITY_TRACE_SAMPLE_RATE', '0'))
+# Recent spans kept for the Diagnostics page
+RECENT_SPANS = 2000
+# Upper bounds (seconds) of the Prometheus histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Span:
+    """One timed operation, with optional row count and payload size in bytes."""
+    __slots__ = ('name', 'trace', 'depth', 'started', 'seconds', 'rows', 'bytes', '_start')
+
+    def __init__(self, name, trace=None, depth=0):
+        self.name = name
+        self.trace = trace
+        self.depth = depth
+        self.started = time.time()
+        self.seconds = None
+        self.rows = None
+        self.bytes = None
+        self._start = time.perf_counter()
+
+    def close(self):
+        self.seconds = time.perf_counter() - self._start
+        _record(self)
+
+class _NullSpan:
+    """Stands in for a Span when nothing is recorded; attribute writes are ignored."""
+    def __setattr__(self, name, value):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class SpanStats:
+    """Running totals of every recorded span with one name."""
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, span):
+        self.count += 1
+        self.seconds += span.seconds
+        self.max_seconds = max(self.max_seconds, span.seconds)
+        self.rows += span.rows or 0
+        self.bytes += span.bytes or 0
+        for i, bound in enumerate(BUCKETS):
+            if span.seconds <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+_lock = threading.Lock()
+_stats = {}
+_recent = deque(maxlen=RECENT_SPANS)
+_traces = 0
+# Per-thread stack of open spans; None as the root means the trace was not sampled
+_local = threading.local()
+
+def configure(sample_rate):
+    """Set the fraction of traces recorded from now on (0 turns instrumentation off)."""
+    global SAMPLE_RATE
+    if not 0 <= sample_rate <= 1:
+        raise ValueError("sample_rate must be between 0 and 1")
+    SAMPLE_RATE = sample_rate
+
+def enabled():
+    return SAMPLE_RATE > 0
+
+def reset():
+    """Forget everything recorded so far."""
+    global _traces
+    with _lock:
+        _stats.clear()
+        _recent.clear()
+        _traces = 0
+
+def _record(span):
+    with _lock:
+        stats = _stats.get(span.name)
+        if stats is None:
+            stats = _stats[span.name] = SpanStats()
+        stats.add(span)
+        _recent.append(span)
+
+def begin(name):
+    """
+    Start a new trace rooted at a span named name, discarding any spans
+    this thread left open (e.g. a Streamlit rerun interrupted by st.rerun()).
+    Returns the root span to pass to end(), or None when not sampled.
+    """
+    global _traces
+    if SAMPLE_RATE <= 0 or random.random() >= SAMPLE_RATE:
+        _local.stack = [None]
+        return None
+    with _lock:
+        _traces += 1
+        trace = _traces
+    root = Span(name, trace)
+    _local.stack = [root]
+    return root
+
+def end(root):
+    """Close a trace opened with begin()."""
+    stack = getattr(_local, 'stack', None)
+    _local.stack = []
+    if root is not None and stack and stack[0] is root:
+        root.close()
+
+@contextmanager
+def span(name, rows=None, nbytes=None):
+    """
+    Time the enclosed block as a span. Yields the Span so rows / bytes can
+    be filled in once known. Outside a trace the span starts its own.
+    """
+    stack = getattr(_local, 'stack', None)
+    if SAMPLE_RATE <= 0 or (stack and stack[0] is None):
+        yield _NULL_SPAN
+        return
+
+    if not stack:
+        current = begin(name)
+    else:
+        current = Span(name, stack[0].trace, len(stack))
+        stack.append(current)
+    if current is None:
+        try:
+            yield _NULL_SPAN
+        finally:
+            end(None)
+        return
+
+    current.rows = rows
+    current.bytes = nbytes
+    try:
+        yield current
+    finally:
+        if current.depth == 0:
+            end(current)
+        else:
+            stack.pop()
+            current.close()
+
+def detached(name):
+    """
+    Open a span for work that finishes outside this thread, e.g. a job in
+    a worker process whose own spans never reach this one. It joins the
+    calling thread's trace (or starts a sampled trace of its own) without
+    nesting later spans under it. Close it with span.close() from any
+    thread; returns None when nothing is recorded.
+    """
+    global _traces
+    stack = getattr(_local, 'stack', None)
+    if SAMPLE_RATE <= 0 or (stack and stack[0] is None):
+        return None
+    if stack:
+        return Span(name, stack[0].trace, len(stack))
+    if random.random() >= SAMPLE_RATE:
+        return None
+    with _lock:
+        _traces += 1
+        trace = _traces
+    return Span(name, trace)
+
+def describe(span, result):
+    """Default measurement of a timed function's result: rows and in-memory size."""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if hasattr(result, 'memory_usage') and hasattr(result, '__len__'):
+        span.rows = len(result)
+        usage = result.memory_usage(index=False)
+        span.bytes = int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    elif hasattr(result, 'nbytes') and hasattr(result, '__len__'):
+        span.rows = len(result)
+        span.bytes = int(result.nbytes)
+    elif isinstance(result, (bytes, bytearray, str)):
+        span.bytes = len(result)
+    elif isinstance(result, (list, dict)):
+        span.rows = len(result)
+    elif isinstance(result, int) and not isinstance(result, bool):
+        span.rows = result
+
+def timed(name=None, measure=describe):
+    """
+    Decorator recording every call as a span named name (default
+    module.function), measured with measure(span, result). Costs one
+    attribute check per call while instrumentation is off.
+    """
+    def decorate(func):
+        label = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if SAMPLE_RATE <= 0:
+                return func(*args, **kwargs)
+            with span(label) as current:
+                result = func(*args, **kwargs)
+                if current is not _NULL_SPAN and measure is not None:
+                    try:
+                        measure(current, result)
+                    except Exception:
+                        pass  # a measurement must never break the call it wraps
+                return result
+        return wrapper
+    return decorate
+
+def summary():
+    """Per-span totals, slowest total time first."""
+    with _lock:
+        items = [(name, stats.count, stats.seconds, stats.max_seconds, stats.rows, stats.bytes)
+                 for name, stats in _stats.items()]
+    return [
+        {'span': name, 'calls': count, 'total_seconds': seconds, 'mean_seconds': seconds / count,
+         'max_seconds': max_seconds, 'rows': rows, 'bytes': payload}
+        for name, count, seconds, max_seconds, rows, payload in sorted(items, key=lambda item: -item[2])
+    ]
+
+def recent(limit=200):
+    """The latest recorded spans, newest first."""
+    with _lock:
+        spans = list(_recent)[-limit:]
+    return [
+        {'trace': s.trace, 'span': s.name, 'depth': s.depth, 'started': s.started,
+         'seconds': s.seconds, 'rows': s.rows, 'bytes': s.bytes}
+        for s in reversed(spans)
+    ]
+
+def to_json(limit=200):
+    """Everything recorded, as a JSON document."""
+    return json.dumps({
+        'sample_rate': SAMPLE_RATE,
+        'traces': _traces,
+        'spans': summary(),
+        'recent': recent(limit),
+    }, indent=2)
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def to_prometheus():
+    """Span totals in the Prometheus text exposition format."""
+    with _lock:
+        items = sorted((name, stats.count, stats.seconds, stats.rows, stats.bytes, list(stats.buckets))
+                       for name, stats in _stats.items())
+    lines = [
+        '# HELP maturity_span_seconds Duration of instrumented operations (sampled).',
+        '# TYPE maturity_span_seconds histogram',
+    ]
+    for name, count, seconds, _, _, buckets in items:
+        label = f'span="{_label(name)}"'
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS, buckets):
+            cumulative += bucket
+            lines.append(f'maturity_span_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f'maturity_span_seconds_bucket{{{label},le="+Inf"}} {count}')
+        lines.append(f'maturity_span_seconds_sum{{{label}}} {seconds}')
+        lines.append(f'maturity_span_seconds_count{{{label}}} {count}')
+    for metric, index, help_text in (('rows', 3, 'Rows returned or processed'), ('bytes', 4, 'Payload bytes produced')):
+        lines.append(f'# HELP maturity_span_{metric}_total {help_text} by instrumented operations (sampled).')
+        lines.append(f'# TYPE maturity_span_{metric}_total counter')
+        for item in items:
+            lines.append(f'maturity_span_{metric}_total{{span="{_label(item[0])}"}} {item[index]}')
+    lines.append('# HELP maturity_sample_rate Fraction of traces recorded.')
+    lines.append('# TYPE maturity_sample_rate gauge')
+    lines.append(f'maturity_sample_rate {SAMPLE_RATE}')
+    return '\n'.join(lines) + '\n'
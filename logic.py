@@ -1,59 +1,237 @@
+import bisect
+import json
+import os
+import sys
+import numpy as np
 import pandas as pd
+import instrumentation
 
-def calculate_maturity_index(row):
+# Recommendation rule table (dimension -> threshold bands -> message).
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recommendations.json')
+
+# Score columns in the order they are stored in the assessments table.
+SCORE_COLUMNS = ['tech_score', 'culture_score', 'process_score', 'skills_score', 'risk_score']
+DIMENSIONS = ['Tech', 'Culture', 'Process', 'Skills', 'Risk']
+
+# Strategic Weighted Formula from the User Manual (Tech 30%, Process 25%, ...).
+STRATEGIC_WEIGHTS = {
+    'tech_score': 0.30,
+    'process_score': 0.25,
+    'skills_score': 0.20,
+    'risk_score': 0.15,
+    'culture_score': 0.10,
+}
+
+# Lower bounds of the Developing / Established / Advanced levels.
+LABEL_THRESHOLDS = np.array([2.0, 3.0, 4.0])
+MATURITY_LABELS = ['Nascent', 'Developing', 'Established', 'Advanced']
+
+# Assessment frames hold scores as float32 (~7 significant digits); widening
+# rounds them back to this many decimals so 3.2 stays 3.2, not 3.2000000477.
+SCORE_DECIMALS = 6
+
+def widen_scores(scores):
+    """float64 array of scores, undoing float32 storage error."""
+    scores = np.asarray(scores)
+    if scores.dtype == np.float32:
+        return np.round(scores.astype(np.float64), SCORE_DECIMALS)
+    return scores.astype(np.float64)
+
+def _weight_vector(weights):
+    """
+    Converts a weights mapping (score column or dimension name -> weight) or a
+    sequence of five weights into an array aligned with SCORE_COLUMNS.
+    """
+    if isinstance(weights, dict):
+        vector = []
+        for col, dim in zip(SCORE_COLUMNS, DIMENSIONS):
+            if col in weights:
+                vector.append(weights[col])
+            elif dim in weights:
+                vector.append(weights[dim])
+            else:
+                raise ValueError(f"Missing weight for dimension '{dim}'")
+    else:
+        vector = list(weights)
+    vector = np.asarray(vector, dtype=float)
+    if vector.shape != (len(SCORE_COLUMNS),):
+        raise ValueError(f"Expected {len(SCORE_COLUMNS)} weights, got {vector.size}")
+    if (vector < 0).any() or vector.sum() <= 0:
+        raise ValueError("Weights must be non-negative and not all zero")
+    return vector
+
+def calculate_maturity_index(row, weights=None):
     """
     Calculates the overall Maturity Index from individual dimension scores.
-    Simple average.
+    Simple average, or a weighted average when weights are given.
     """
     # Assuming the row contains the score columns
-    scores = [row['tech_score'], row['culture_score'], row['process_score'], row['skills_score'], row['risk_score']]
-    return sum(scores) / len(scores)
+    scores = widen_scores([row['tech_score'], row['culture_score'], row['process_score'], row['skills_score'], row['risk_score']]).tolist()
+    if weights is None:
+        return sum(scores) / len(scores)
+    vector = _weight_vector(weights)
+    return sum(s * w for s, w in zip(scores, vector)) / vector.sum()
 
-def get_recommendations(row):
+@instrumentation.timed()
+def calculate_maturity_indices(scores, weights=None):
     """
-    Generates recommendations based on scores.
-    Returns a dictionary of dimension -> recommendation string.
+    Batch version of calculate_maturity_index.
+    Accepts a DataFrame with the score columns or an (n, 5) score matrix in
+    SCORE_COLUMNS order and returns a float array of Maturity Index values.
     """
-    recommendations = {}
-    
-    # Tech Recommendations
-    if row['tech_score'] < 2.5:
-        recommendations['Tech'] = "Legacy systems detected. Prioritize cloud migration and API modernization."
-    elif row['tech_score'] < 4.0:
-        recommendations['Tech'] = "Good foundation. Focus on AI integration and data analytics."
-    else:
-        recommendations['Tech'] = "Industry leader. Explore cutting-edge tech like Quantum or Edge computing."
-        
-    # Culture Recommendations
-    if row['culture_score'] < 2.5:
-        recommendations['Culture'] = "Siloed teams. Implement cross-functional agile squads."
-    elif row['culture_score'] < 4.0:
-        recommendations['Culture'] = "Collaborative. Encourage more experimentation and psychological safety."
+    if isinstance(scores, pd.DataFrame):
+        scores = widen_scores(scores[SCORE_COLUMNS].to_numpy())
     else:
-        recommendations['Culture'] = "Innovative culture. Maintain by sponsoring hackathons and external partnerships."
+        scores = widen_scores(scores)
+    if scores.ndim != 2 or scores.shape[1] != len(SCORE_COLUMNS):
+        raise ValueError(f"Expected an (n, {len(SCORE_COLUMNS)}) score matrix, got shape {scores.shape}")
 
-    # Process Recommendations
-    if row['process_score'] < 2.5:
-        recommendations['Process'] = "Manual & reactive. Automate core workflows immediately."
-    elif row['process_score'] < 4.0:
-        recommendations['Process'] = "Defined processes. Move towards data-driven process optimization."
-    else:
-        recommendations['Process'] = "Optimized. focus on predictive process modeling."
+    # Accumulate column by column so results match the scalar version exactly
+    if weights is None:
+        total = scores[:, 0].copy()
+        for j in range(1, scores.shape[1]):
+            total += scores[:, j]
+        return total / scores.shape[1]
 
-    # Skills Recommendations
-    if row['skills_score'] < 2.5:
-        recommendations['Skills'] = "Critical skill gaps. Initiate comprehensive upskilling programs."
-    elif row['skills_score'] < 4.0:
-        recommendations['Skills'] = "Specialized gaps. Hire for key roles in AI/Data."
-    else:
-        recommendations['Skills'] = "Strong talent pool. Focus on retention and leadership."
+    vector = _weight_vector(weights)
+    total = scores[:, 0] * vector[0]
+    for j in range(1, scores.shape[1]):
+        total += scores[:, j] * vector[j]
+    return total / vector.sum()
 
-    # Risk Recommendations
-    if row['risk_score'] < 2.5:
-        recommendations['Risk'] = "High Exposure. Implement robust cybersecurity frameworks immediately."
-    elif row['risk_score'] < 4.0:
-        recommendations['Risk'] = "Moderate Risk. Regular audits and compliance checks needed."
-    else:
-        recommendations['Risk'] = "Resilient. Focus on proactive threat hunting and zero-trust."
+def department_unit(name, depth=1, sep='_'):
+    """
+    Organisational unit of a department name, taken from its leading
+    name parts (e.g. 'CSE_Student_1' -> 'CSE').
+    """
+    return sep.join(str(name).split(sep)[:depth])
+
+def department_role(name, position=1, sep='_'):
+    """
+    Role part of a department name (e.g. 'CSE_Student_1' -> 'Student'),
+    or '' when the name has no such part.
+    """
+    parts = str(name).split(sep)
+    return parts[position] if len(parts) > position else ''
+
+def get_label(score):
+    """Maps a Maturity Index value to its maturity level."""
+    if score >= 4.0: return "Advanced"
+    elif score >= 3.0: return "Established"
+    elif score >= 2.0: return "Developing"
+    else: return "Nascent"
+
+def label_codes(indices):
+    """
+    Maturity level of each Maturity Index value as its position in
+    MATURITY_LABELS (0 = Nascent, NaN included), for arrays of any shape.
+    """
+    indices = np.asarray(indices, dtype=float)
+    codes = np.searchsorted(LABEL_THRESHOLDS, indices, side='right').astype(np.int8)
+    codes[np.isnan(indices)] = 0
+    return codes
+
+def get_labels(indices):
+    """
+    Batch version of get_label.
+    Returns an ordered Categorical of maturity levels (NaN maps to Nascent).
+    """
+    return pd.Categorical.from_codes(label_codes(indices), categories=MATURITY_LABELS, ordered=True)
+
+@instrumentation.timed()
+def score_frame(df, weights=None):
+    """
+    Returns a copy of df with 'Maturity Index' and 'Maturity Label' columns
+    computed for every row in one pass.
+    """
+    indices = calculate_maturity_indices(df, weights)
+    return df.assign(**{
+        'Maturity Index': indices,
+        'Maturity Label': get_labels(indices),
+    })
+
+class RecommendationRule:
+    """
+    One compiled rule: a score column split into bands by ascending
+    thresholds, with one (interned) message per band.
+    """
+    def __init__(self, dimension, column, thresholds, messages):
+        if len(messages) != len(thresholds) + 1:
+            raise ValueError(f"Rule '{dimension}' needs exactly one message per band")
+        if any(a >= b for a, b in zip(thresholds, thresholds[1:])):
+            raise ValueError(f"Rule '{dimension}' thresholds must be strictly ascending")
+        self.dimension = sys.intern(dimension)
+        self.column = column
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.messages = np.empty(len(messages), dtype=object)
+        self.messages[:] = [sys.intern(m) for m in messages]
+        self._bounds = list(thresholds)
+
+    def band(self, score):
+        """Band number for a single score (NaN falls in the top band, like the old if/elif chain)."""
+        return bisect.bisect_right(self._bounds, score)
+
+    def bands(self, scores):
+        """Band numbers for an array of scores."""
+        return np.searchsorted(self.thresholds, np.asarray(scores, dtype=float), side='right')
+
+def load_rules(path=RULES_FILE):
+    """
+    Loads and compiles the recommendation rule table from a JSON config file.
+    Each rule lists its bands in order; every band but the last has a 'below' bound.
+    """
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
 
-    return recommendations
+    rules = []
+    for rule in config['rules']:
+        bands = rule['bands']
+        if any('below' not in band for band in bands[:-1]) or 'below' in bands[-1]:
+            raise ValueError(f"Rule '{rule['dimension']}': only the last band may omit 'below'")
+        thresholds = [float(band['below']) for band in bands[:-1]]
+        messages = [band['message'] for band in bands]
+        rules.append(RecommendationRule(rule['dimension'], rule['column'], thresholds, messages))
+    return rules
+
+_default_rules = None
+
+def get_rules():
+    """Returns the rule table loaded from RULES_FILE, compiling it on first use."""
+    global _default_rules
+    if _default_rules is None:
+        _default_rules = load_rules()
+    return _default_rules
+
+@instrumentation.timed()
+def get_recommendations(row, rules=None):
+    """
+    Generates recommendations based on scores.
+    Returns a dictionary of dimension -> recommendation string.
+    """
+    rules = rules if rules is not None else get_rules()
+    return {rule.dimension: rule.messages[rule.band(row[rule.column])] for rule in rules}
+
+def recommendation_bands(df, rules=None):
+    """
+    Returns an (n, n_rules) integer array with the band each row falls into
+    for every rule, in rule order.
+    """
+    rules = rules if rules is not None else get_rules()
+    bands = np.empty((len(df), len(rules)), dtype=np.int8)
+    for j, rule in enumerate(rules):
+        bands[:, j] = rule.bands(df[rule.column])
+    return bands
+
+@instrumentation.timed()
+def get_recommendations_frame(df, rules=None):
+    """
+    Batch version of get_recommendations.
+    Returns a DataFrame aligned with df with one column of recommendations
+    per dimension. Cells share the interned message objects of the rule table.
+    """
+    rules = rules if rules is not None else get_rules()
+    bands = recommendation_bands(df, rules)
+    return pd.DataFrame(
+        {rule.dimension: rule.messages.take(bands[:, j]) for j, rule in enumerate(rules)},
+        index=df.index,
+    )
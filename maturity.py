@@ -0,0 +1,237 @@
+"""
+Headless command line interface for the Digital Maturity Platform.
+
+    python -m maturity ingest data.csv --errors errors.csv   (or data.parquet)
+    python -m maturity score --output scored.csv
+    python -m maturity export --output assessments.csv   (or .parquet / .arrow)
+    python -m maturity snapshot
+    python -m maturity compact
+    python -m maturity summary
+    python -m maturity report --output reports.zip
+    python -m maturity simulate --delta Skills=0,0.5 --delta Process=0,1 --output scenarios.csv
+
+Heavy modules (pandas, FPDF) are imported inside the commands that need them,
+and Streamlit / Plotly are never imported.
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+def _progress(message):
+    """Overwrites the current terminal line when attached to a TTY."""
+    if sys.stderr.isatty():
+        print(f"\r{message}", end='', file=sys.stderr, flush=True)
+
+@contextmanager
+def _open_output(path):
+    """Opens a CSV file for writing, or yields stdout for '-'."""
+    if path == '-':
+        yield sys.stdout
+        return
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        yield f
+
+def cmd_ingest(args):
+    import database
+    import validation
+
+    if args.period is not None:
+        try:
+            database.check_period(args.period)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+
+    start = time.perf_counter()
+    fmt = 'parquet' if args.file.lower().endswith('.parquet') else 'csv'
+    chunks = database.iter_upload_chunks(args.file, fmt, args.chunksize, columns=list(database.CSV_COLUMNS))
+    report = validation.ValidationReport()
+    progress = lambda rows: _progress(f"{rows:,} rows imported")
+    if args.mode == 'upsert':
+        counts = database.upsert_assessments(report.validate(chunks), args.period, progress=progress)
+        outcome = f"{counts['inserted']:,} inserted, {counts['updated']:,} updated, {counts['skipped']:,} unchanged"
+        if counts['repeated']:
+            outcome += f", {counts['repeated']:,} repeated departments ignored (one row per department per import)"
+    else:
+        outcome = f"{database.bulk_save_assessments(report.validate(chunks), progress=progress):,} inserted"
+    _progress('')
+    print(f"Imported {args.file} in {time.perf_counter() - start:.1f}s: {outcome} ({report.summary()})")
+    if report.rows_rejected and args.errors:
+        with _open_output(args.errors) as out:
+            out.write(report.to_csv())
+        print(f"Rejected rows written to {args.errors}")
+
+def cmd_compact(args):
+    import database
+
+    removed = database.compact_assessments(args.period)
+    print(f"Removed {removed:,} duplicate assessments")
+
+def cmd_summary(args):
+    import database
+
+    database.rebuild_department_summary()
+    print(f"Rebuilt the summary of {len(database.get_departments()):,} departments")
+
+def cmd_score(args):
+    import pandas as pd
+    import database
+    import logic
+
+    weights = logic.STRATEGIC_WEIGHTS if args.weights == 'strategic' else None
+    if args.input:
+        chunks = (chunk.rename(columns=database.CSV_COLUMNS)
+                  for chunk in pd.read_csv(args.input, chunksize=args.chunksize))
+    else:
+        chunks = database.iter_assessments(args.chunksize)
+
+    count = 0
+    with _open_output(args.output) as out:
+        for chunk in chunks:
+            scored = logic.score_frame(chunk, weights)
+            scored.to_csv(out, index=False, header=(count == 0))
+            count += len(scored)
+            _progress(f"{count:,} rows scored")
+    _progress('')
+    print(f"Scored {count:,} rows", file=sys.stderr)
+
+def cmd_export(args):
+    import database
+
+    if os.path.splitext(args.output)[1].lower() in database.SNAPSHOT_FORMATS:
+        count = database.export_snapshot(args.output, batch_size=args.chunksize)
+        print(f"Exported {count:,} rows to {args.output}", file=sys.stderr)
+        return
+
+    count = 0
+    with _open_output(args.output) as out:
+        for chunk in database.iter_assessments(args.chunksize):
+            chunk.to_csv(out, index=False, header=(count == 0))
+            count += len(chunk)
+            _progress(f"{count:,} rows exported")
+    _progress('')
+    print(f"Exported {count:,} rows", file=sys.stderr)
+
+def cmd_snapshot(args):
+    import database
+
+    start = time.perf_counter()
+    count = database.export_snapshot()
+    print(f"Wrote {count:,} rows to {database.snapshot_path()} in {time.perf_counter() - start:.1f}s")
+
+def cmd_report(args):
+    import database
+    import reports
+
+    df = database.load_latest_assessments()
+    failures = []
+    with open(args.output, 'wb') as f:
+        count = reports.export_reports_zip(df, f, progress=lambda done, total: _progress(f"{done}/{total} reports"), failures=failures)
+    _progress('')
+    print(f"Wrote {count} reports to {args.output}")
+    for department, error in failures:
+        print(f"Skipped {department}: {error}", file=sys.stderr)
+
+def _parse_delta(text):
+    """'Skills=0,0.5,1' -> ('Skills', [0.0, 0.5, 1.0])."""
+    name, sep, values = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected DIMENSION=DELTA[,DELTA...], got '{text}'")
+    try:
+        return name.strip(), [float(value) for value in values.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"deltas must be numbers, got '{values}'")
+
+def cmd_simulate(args):
+    import database
+    import logic
+    import simulation
+
+    if args.random:
+        deltas = simulation.random_deltas(args.random, args.spread, seed=args.seed)
+    else:
+        try:
+            deltas = simulation.delta_grid(dict(args.delta or []))
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+    df = database.load_latest_assessments(args.department)
+    if df.empty:
+        sys.exit("Error: no matching departments")
+
+    start = time.perf_counter()
+    weights = logic.STRATEGIC_WEIGHTS if args.weights == 'strategic' else None
+    summary = simulation.simulate(df, deltas, weights).summary()
+    with _open_output(args.output) as out:
+        summary.to_csv(out, index=False)
+    print(f"Simulated {len(summary):,} scenarios over {len(df):,} departments in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='maturity', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', help='SQLite database file (default: $MATURITY_DB or maturity_platform.db)')
+    parser.add_argument('--chunksize', type=int, default=100000, help='rows processed per chunk')
+    parser.add_argument('--trace', help='write timings of the run to this file (Prometheus text for .prom, otherwise JSON)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help='import a CSV or Parquet file with Department, Tech, Culture, Process, Skills, Risk columns')
+    ingest.add_argument('file')
+    ingest.add_argument('--errors', help="CSV file for rejected rows and their reasons ('-' for stdout)")
+    ingest.add_argument('--mode', choices=['upsert', 'append'], default='upsert',
+                        help='upsert keeps one row per department and period, so re-running an import is a no-op; append always adds rows')
+    ingest.add_argument('--period', help="month to import into, as its first day, e.g. 2024-05-01 (default: the current month); rows of earlier months are dated to that day")
+    ingest.set_defaults(func=cmd_ingest)
+
+    compact = commands.add_parser('compact', help='remove duplicate assessments (same department and scores within a period)')
+    compact.add_argument('--period', choices=['day', 'week', 'month'], default='month', help='window in which repeats count as duplicates')
+    compact.set_defaults(func=cmd_compact)
+
+    summary = commands.add_parser('summary', help='rebuild the per-department summary table from the assessments')
+    summary.set_defaults(func=cmd_summary)
+
+    score = commands.add_parser('score', help='write Maturity Index and Label for every assessment as CSV')
+    score.add_argument('--input', help='score this CSV instead of the database')
+    score.add_argument('--output', '-o', default='-', help="CSV file to write ('-' for stdout)")
+    score.add_argument('--weights', choices=['equal', 'strategic'], default='equal', help='dimension weighting')
+    score.set_defaults(func=cmd_score)
+
+    export = commands.add_parser('export', help='export the assessments table as CSV, Parquet or Arrow')
+    export.add_argument('--output', '-o', default='-', help="file to write, format taken from the extension ('-' for CSV on stdout)")
+    export.set_defaults(func=cmd_export)
+
+    snapshot = commands.add_parser('snapshot', help='refresh the Arrow snapshot the Dashboard loads from')
+    snapshot.set_defaults(func=cmd_snapshot)
+
+    report = commands.add_parser('report', help="ZIP every department's latest PDF report")
+    report.add_argument('--output', '-o', default='maturity_reports.zip', help='ZIP file to write')
+    report.set_defaults(func=cmd_report)
+
+    simulate = commands.add_parser('simulate', help='evaluate score changes on the latest assessments without saving them, one CSV row per scenario')
+    simulate.add_argument('--delta', action='append', type=_parse_delta, metavar='DIMENSION=DELTA[,DELTA...]',
+                          help='score changes to try for a dimension (repeatable); every combination is one scenario')
+    simulate.add_argument('--random', type=int, metavar='N', help='N random scenarios changing every dimension instead of a grid')
+    simulate.add_argument('--spread', type=float, default=1.0, help='largest random change per dimension')
+    simulate.add_argument('--seed', type=int, help='random seed')
+    simulate.add_argument('--department', action='append', help='simulate only this department (repeatable, default all)')
+    simulate.add_argument('--weights', choices=['equal', 'strategic'], default='equal', help='dimension weighting')
+    simulate.add_argument('--output', '-o', default='-', help="CSV file to write ('-' for stdout)")
+    simulate.set_defaults(func=cmd_simulate)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db:
+        # Must be set before database is first imported
+        os.environ['MATURITY_DB'] = args.db
+    if not args.trace:
+        args.func(args)
+        return
+
+    import instrumentation
+    instrumentation.configure(1.0)
+    with instrumentation.span(f"cli.{args.command}"):
+        args.func(args)
+    with open(args.trace, 'w', encoding='utf-8') as f:
+        f.write(instrumentation.to_prometheus() if args.trace.endswith('.prom') else instrumentation.to_json())
+
+if __name__ == '__main__':
+    main()
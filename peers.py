@@ -0,0 +1,246 @@
+import math
+import threading
+import numpy as np
+import pandas as pd
+import database
+import instrumentation
+import logic
+
+# Columns every department is ranked on: the five dimensions and the Maturity Index
+PEER_COLUMNS = logic.SCORE_COLUMNS + ['Maturity Index']
+
+# Peer groups a department can be compared with: label -> function mapping a
+# department name to its cohort (None compares it with every department).
+# Departments whose cohort is '' have no peer group under that label.
+COHORTS = {
+    'All departments': None,
+    'Same role': logic.department_role,
+    'Same unit': logic.department_unit,
+}
+
+class SortedScores:
+    """
+    One column of peer scores kept sorted. Changes are merged in and out
+    without re-sorting, and ranks are binary searches.
+    """
+    def __init__(self, values=()):
+        values = np.asarray(values, dtype=float)
+        self.values = np.sort(values[~np.isnan(values)])
+
+    def __len__(self):
+        return len(self.values)
+
+    def copy(self):
+        copied = SortedScores()
+        copied.values = self.values
+        return copied
+
+    def add(self, values):
+        values = np.sort(np.asarray(values, dtype=float))
+        values = values[~np.isnan(values)]
+        self.values = np.insert(self.values, np.searchsorted(self.values, values), values)
+
+    def remove(self, values):
+        """Removes one occurrence of each value (values must be present)."""
+        values = np.sort(np.asarray(values, dtype=float))
+        values = values[~np.isnan(values)]
+        # Repeated values take consecutive positions within their run of equals
+        repeat = np.arange(len(values)) - np.searchsorted(values, values)
+        self.values = np.delete(self.values, np.searchsorted(self.values, values) + repeat)
+
+    def rank(self, values):
+        """
+        (rank, share at or above) of each value: rank 1 is the highest score
+        and ties share a rank; the share in percent is the "top X%" figure.
+        """
+        values = np.asarray(values, dtype=float)
+        n = len(self.values)
+        higher = n - np.searchsorted(self.values, values, side='right')
+        at_least = n - np.searchsorted(self.values, values, side='left')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return higher + 1, 100.0 * at_least / n
+
+class _PeerState:
+    """
+    One version of a PeerIndex: the scores frame, the same scores as a
+    matrix and the SortedScores of every cohort group. refresh() publishes
+    a new state instead of changing this one, so queries running in other
+    sessions always see a consistent set.
+    """
+    def __init__(self, scores, groups):
+        self.scores = scores
+        self.matrix = scores.to_numpy()
+        self.groups = groups
+        self.cohort_keys = {}  # filled lazily; same result whichever thread computes it
+
+class PeerIndex:
+    """
+    Latest scores of every department with one SortedScores per column for
+    all departments and for each cohort, so a department's standing is a
+    few binary searches. refresh() applies only the departments that changed.
+    The same scores, as one matrix, answer nearest-neighbour queries.
+    """
+    def __init__(self, cohorts=None):
+        self.cohorts = dict(COHORTS if cohorts is None else cohorts)
+        self._state = _PeerState(pd.DataFrame(columns=PEER_COLUMNS, dtype=float), {label: {} for label in self.cohorts})
+
+    @property
+    def scores(self):
+        return self._state.scores
+
+    def _keys(self, label, names):
+        """Cohort key of each name under label; None for names without a peer group."""
+        group = self.cohorts[label]
+        if group is None:
+            return pd.Series('', index=names, dtype=object)
+        return pd.Series([group(name) or None for name in names], index=names, dtype=object)
+
+    def _apply(self, groups, copied, scores, add):
+        """
+        Adds or removes scores in groups, copying each group's SortedScores
+        before its first change. Names without a peer group are left out.
+        """
+        for label in self.cohorts:
+            for key, rows in scores.groupby(self._keys(label, scores.index), sort=False, dropna=True):
+                if (label, key) not in copied:
+                    columns = groups[label].get(key)
+                    columns = [SortedScores() for _ in PEER_COLUMNS] if columns is None else [c.copy() for c in columns]
+                    groups[label][key] = columns
+                    copied.add((label, key))
+                for sorted_scores, col in zip(groups[label][key], PEER_COLUMNS):
+                    (sorted_scores.add if add else sorted_scores.remove)(rows[col].to_numpy())
+
+    @instrumentation.timed()
+    def refresh(self, latest):
+        """
+        Bring the index up to date with latest, one assessment per department
+        (e.g. database.load_latest_assessments()). Returns the number of
+        departments added, changed or removed.
+        """
+        scores = pd.DataFrame(
+            logic.widen_scores(latest[logic.SCORE_COLUMNS].to_numpy()),
+            columns=logic.SCORE_COLUMNS, index=latest['department'].astype(str).to_numpy(),
+        )
+        scores['Maturity Index'] = logic.calculate_maturity_indices(scores.to_numpy())
+
+        state = self._state
+        old = state.scores.reindex(scores.index)
+        known = scores.index.isin(state.scores.index)
+        same = ((old == scores) | (old.isna() & scores.isna())).all(axis=1) & known
+        removed = state.scores.index.difference(scores.index)
+        outdated = state.scores.loc[removed.append(scores.index[~same & known])]
+        changed = scores[~same]
+
+        groups = {label: dict(state.groups[label]) for label in self.cohorts}
+        copied = set()
+        if len(outdated):
+            self._apply(groups, copied, outdated, add=False)
+        if len(changed):
+            self._apply(groups, copied, changed, add=True)
+        self._state = _PeerState(scores, groups)
+        return len(removed) + len(changed)
+
+    def standings(self, names, cohort='All departments'):
+        """
+        Standing of each named department among its cohort: a DataFrame
+        indexed by name with, per PEER_COLUMNS column, '<column> rank'
+        (1 = best) and '<column> top %', plus 'peers' (the cohort size).
+        Departments not in the index or without a peer group in cohort get NaN.
+        """
+        state = self._state
+        names = pd.Index([str(name) for name in names])
+        known = names[state.scores.index.get_indexer(names) >= 0]
+        result = pd.DataFrame(index=names, columns=['peers'] + [f'{col} {part}' for col in PEER_COLUMNS for part in ('rank', 'top %')], dtype=float)
+        groups = state.groups[cohort]
+        keys = self._keys(cohort, known)
+        for key, members in keys.groupby(keys, sort=False, dropna=True):
+            columns = groups[key]
+            rows = state.scores.loc[members.index]
+            result.loc[members.index, 'peers'] = max(len(sorted_scores) for sorted_scores in columns)
+            for sorted_scores, col in zip(columns, PEER_COLUMNS):
+                rank, top = sorted_scores.rank(rows[col].to_numpy())
+                result.loc[members.index, f'{col} rank'] = rank
+                result.loc[members.index, f'{col} top %'] = top
+        return result
+
+    def _distances(self, state, name, cohort):
+        """
+        Position of name and the Euclidean distance of every department's
+        five scores to its own; itself, other cohorts and incomplete score
+        vectors are at infinity, and so is everyone when name has no peer
+        group in cohort.
+        """
+        position = state.scores.index.get_loc(str(name))
+        scores = state.matrix[:, :len(logic.SCORE_COLUMNS)]
+        diff = scores - scores[position]
+        distances = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+        distances[np.isnan(distances)] = np.inf
+        distances[position] = np.inf
+        if self.cohorts[cohort] is not None:
+            keys = state.cohort_keys.get(cohort)
+            if keys is None:
+                keys = state.cohort_keys[cohort] = self._keys(cohort, state.scores.index).to_numpy()
+            key = keys[position]
+            distances[(keys != key) if key is not None else slice(None)] = np.inf
+        return position, distances
+
+    def _neighbours(self, state, positions, distances):
+        result = state.scores.iloc[positions].copy()
+        result.insert(0, 'distance', distances[positions])
+        return result
+
+    def similar(self, name, k=5, cohort='All departments'):
+        """
+        The k departments whose latest scores are closest to name's
+        (Euclidean distance over the five dimensions, all on the same 1-5
+        scale), nearest first: a DataFrame indexed by department with
+        'distance' and the PEER_COLUMNS scores.
+        """
+        state = self._state
+        position, distances = self._distances(state, name, cohort)
+        k = int(min(k, np.isfinite(distances).sum()))
+        if k <= 0:
+            return self._neighbours(state, [], distances)
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.lexsort((nearest, distances[nearest]))]
+        return self._neighbours(state, nearest, distances)
+
+    def closest_higher(self, name, cohort='All departments'):
+        """
+        The nearest department with a higher Maturity Index than name, as a
+        Series with 'distance' and its scores, or None when name leads its cohort.
+        """
+        state = self._state
+        position, distances = self._distances(state, name, cohort)
+        maturity = state.matrix[:, -1]
+        with np.errstate(invalid='ignore'):
+            distances[~(maturity > maturity[position])] = np.inf
+        best = int(np.argmin(distances))
+        if not np.isfinite(distances[best]):
+            return None
+        return self._neighbours(state, [best], distances).iloc[0]
+
+def top_text(top_percent):
+    """'Top 12%' style text for a share at or above, rounded up so the best is never 'Top 0%'."""
+    if top_percent is None or np.isnan(top_percent):
+        return ''
+    return f"Top {max(1, math.ceil(top_percent - 1e-9))}%"
+
+_index = None
+_version = None
+_lock = threading.Lock()
+
+def get_peer_index():
+    """
+    Shared PeerIndex over the latest assessment of every department,
+    refreshed with the departments that changed whenever the data did.
+    """
+    global _index, _version
+    with _lock:
+        version = database.get_data_version()
+        if _index is None:
+            _index = PeerIndex()
+        if version != _version:
+            _index.refresh(database.load_latest_assessments())
+            _version = version
+        return _index
@@ -0,0 +1,305 @@
+import atexit
+import hashlib
+import io
+import json
+import math
+import multiprocessing
+import re
+import sys
+import threading
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fpdf import FPDF
+import instrumentation
+
+# Bump whenever create_pdf's layout changes so cached reports are not reused
+TEMPLATE_VERSION = 2
+REPORT_WORKERS = 2
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Reports rendered ahead of the one being written during a bulk export
+EXPORT_WINDOW = REPORT_WORKERS * 4
+# Archive entry listing the departments whose report could not be rendered
+FAILED_REPORTS_NAME = 'FAILED_REPORTS.txt'
+
+# Report section label -> assessments column, in the order shown in the PDF
+REPORT_SCORES = {
+    'Technology': 'tech_score',
+    'Process': 'process_score',
+    'Culture': 'culture_score',
+    'Skills': 'skills_score',
+    'Risk': 'risk_score',
+}
+
+def create_pdf(department, scores, recommendations, standings=None):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    
+    # Title
+    pdf.set_font("Arial", "B", 20)
+    pdf.cell(0, 15, f"Digital Maturity Report: {department}", ln=True, align="C")
+    pdf.ln(5)
+    
+    # Section 1: Scores
+    pdf.set_font("Arial", "B", 14)
+    pdf.set_fill_color(200, 220, 255)
+    pdf.cell(0, 10, "1. Assessment Scores (Weighted Model)", ln=True, fill=True)
+    pdf.ln(5)
+    
+    standings = standings or {}
+    pdf.set_font("Arial", "", 12)
+    for category, score in scores.items():
+        pdf.cell(100, 10, f"{category}: {score} / 5.0", ln=not standings.get(category))
+        if standings.get(category):
+            pdf.set_text_color(90, 90, 90)
+            pdf.cell(0, 10, standings[category], ln=True)
+            pdf.set_text_color(0, 0, 0)
+    if standings.get('Maturity Index'):
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 10, f"Maturity Index: {standings['Maturity Index']}", ln=True)
+    
+    pdf.ln(10)
+    
+    # Section 2: Strategic Roadmap
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "2. Strategic Roadmap & Recommendations", ln=True, fill=True)
+    pdf.ln(5)
+    
+    for category, rec in recommendations.items():
+        pdf.set_font("Arial", "B", 12)
+        pdf.set_text_color(0, 102, 204) # Blue header
+        pdf.cell(0, 8, category, ln=True)
+        
+        pdf.set_font("Arial", "", 10)
+        pdf.set_text_color(0, 0, 0) # Black text
+        pdf.multi_cell(0, 6, f"- {rec}")
+        pdf.ln(3)
+        
+    return pdf.output(dest="S").encode("latin-1")
+
+def report_key(department, scores, recommendations, standings=None):
+    """Content hash identifying a rendered report."""
+    payload = json.dumps([
+        TEMPLATE_VERSION,
+        department,
+        [[category, float(score)] for category, score in scores.items()],
+        list(recommendations.items()),
+        sorted((standings or {}).items()),
+    ])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ReportCache:
+    """LRU cache of rendered PDF bytes, bounded by total size."""
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+cache = ReportCache()
+_pending = {}
+_lock = threading.RLock()
+_executor = None
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: forking the multi-threaded Streamlit server is not safe
+            _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+def _store(key, render, future):
+    with _lock:
+        _pending.pop(key, None)
+    if future.cancelled():
+        return
+    error = future.exception()
+    if render is not None:
+        if error is None:
+            render.bytes = len(future.result())
+        render.close()
+    if error is None:
+        cache.put(key, future.result())
+    elif isinstance(error, BrokenProcessPool):
+        # A worker died; start a fresh pool for the next request
+        shutdown()
+
+def submit_report(department, scores, recommendations, standings=None):
+    """
+    Render a department report in the background process pool.
+    standings optionally maps score labels (and 'Maturity Index') to peer
+    standing text, see report_standings.
+    Returns a Future resolving to the PDF bytes; cached reports resolve
+    immediately and identical in-flight requests share one render.
+    """
+    scores = {category: float(score) for category, score in scores.items()}
+    recommendations = dict(recommendations)
+    standings = dict(standings or {})
+    key = report_key(department, scores, recommendations, standings)
+
+    data = cache.get(key)
+    if data is not None:
+        future = Future()
+        future.set_result(data)
+        return future
+
+    with _lock:
+        future = _pending.get(key)
+        if future is None:
+            # Spans recorded inside the worker process are lost, so a render is
+            # timed here, from submission until the worker returns the PDF
+            render = instrumentation.detached('reports.render')
+            future = _get_executor().submit(create_pdf, department, scores, recommendations, standings)
+            _pending[key] = future
+            future.add_done_callback(lambda done, key=key, render=render: _store(key, render, done))
+    return future
+
+@instrumentation.timed()
+def get_report(department, scores, recommendations, standings=None, timeout=None):
+    """PDF bytes for a department report, rendered on demand and cached."""
+    return submit_report(department, scores, recommendations, standings).result(timeout)
+
+def report_scores(row):
+    """Scores of one assessment row keyed by their report section label."""
+    import logic
+    return {label: float(logic.widen_scores(row[col])) for label, col in REPORT_SCORES.items()}
+
+def report_standings(standing, cohort='All departments'):
+    """
+    Peer standing text ('Top 12% of 57 departments') per report section label
+    and for 'Maturity Index', from one row of peers.PeerIndex.standings.
+    """
+    import peers
+    if standing is None or standing.isna().all():
+        return {}
+    cohort_text = 'departments' if cohort == 'All departments' else f'departments ({cohort.lower()})'
+    columns = dict(REPORT_SCORES, **{'Maturity Index': 'Maturity Index'})
+    return {
+        label: f"{peers.top_text(standing[f'{col} top %'])} of {int(standing['peers'])} {cohort_text}"
+        for label, col in columns.items()
+        if not math.isnan(standing[f'{col} top %'])
+    }
+
+def report_filename(department):
+    """File name for a department report, safe to use inside a ZIP archive."""
+    safe = re.sub(r'[\\/:*?"<>|]+', '_', str(department)).strip() or 'department'
+    return f"{safe}_Maturity_Report.pdf"
+
+def iter_department_reports(df, failures=None):
+    """
+    Yields (department, pdf_bytes) for every row of df (one assessment per
+    department, e.g. database.load_latest_assessments()), in order.
+    Renders run in the worker pool with at most EXPORT_WINDOW reports in
+    flight, so rendering memory stays bounded however many departments
+    there are. A department whose report fails to render is skipped and,
+    when failures is a list, appended to it as (department, error).
+    """
+    import logic  # only needed for exports; keeps report workers light
+    import peers
+
+    recs = logic.get_recommendations_frame(df)
+    standings = peers.get_peer_index().standings(df['department'])
+    # Widened here: iterrows would turn float32 scores into floats carrying storage error
+    scores = logic.widen_scores(df[list(REPORT_SCORES.values())].to_numpy()).tolist()
+    score_rows = (dict(zip(REPORT_SCORES, row)) for row in scores)
+    window = deque()
+    for department, score_row, rec_row, (_, standing) in zip(df['department'], score_rows, recs.to_dict('records'), standings.iterrows()):
+        window.append((department, submit_report(department, score_row, rec_row, report_standings(standing))))
+        if len(window) >= EXPORT_WINDOW:
+            yield from _finished_report(*window.popleft(), failures)
+    while window:
+        yield from _finished_report(*window.popleft(), failures)
+
+def _finished_report(department, future, failures):
+    try:
+        data = future.result()
+    except Exception as e:
+        if failures is not None:
+            failures.append((department, e))
+        return
+    yield department, data
+
+@instrumentation.timed()
+def export_reports_zip(df, fileobj, progress=None, failures=None):
+    """
+    Writes every department's report from df into a ZIP archive on fileobj,
+    one entry at a time. progress(done, total) is called after each entry.
+    Reports that fail to render are left out and listed in a
+    FAILED_REPORTS_NAME entry (and appended to failures, if given) instead
+    of aborting the archive.
+    Returns the number of reports written.
+    """
+    total = len(df)
+    done = 0
+    used_names = set()
+    failures = [] if failures is None else failures
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for department, data in iter_department_reports(df, failures):
+            name = report_filename(department)
+            if name in used_names:
+                name = name.replace('.pdf', f'_{done + 1}.pdf')
+            used_names.add(name)
+            archive.writestr(name, data)
+            done += 1
+            if progress is not None:
+                progress(done + len(failures), total)
+        if failures:
+            archive.writestr(FAILED_REPORTS_NAME, ''.join(
+                f"{department}: {type(error).__name__}: {error}\n" for department, error in failures))
+    return done
+
+def export_reports_zip_bytes(df):
+    """
+    ZIP archive of every department's report, as bytes for a download
+    button. Unlike export_reports_zip to a file, the whole archive is held
+    in memory, so its size grows with the number of departments.
+    """
+    buffer = io.BytesIO()
+    export_reports_zip(df, buffer)
+    return buffer.getvalue()
+
+def shutdown():
+    """Stop the worker processes, dropping queued renders."""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+atexit.register(shutdown)
+
+def main(argv=None):
+    """Command line entry point, equivalent to `python -m maturity report`."""
+    import maturity
+    maturity.main(['report'] + list(sys.argv[1:] if argv is None else argv))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+import instrumentation
+import logic
+import validation
+
+# Scenario x department pairs evaluated at a time; bounds the temporary
+# score and band arrays when a grid has thousands of scenarios.
+CHUNK_CELLS = 500_000
+
+# Default sensitivity sweep: each dimension moved by -1 to +1 point
+SENSITIVITY_STEPS = np.round(np.arange(-1.0, 1.01, 0.25), 2)
+
+def _dimension_position(name):
+    """Position in SCORE_COLUMNS of a score column or dimension name."""
+    if name in logic.SCORE_COLUMNS:
+        return logic.SCORE_COLUMNS.index(name)
+    if name in logic.DIMENSIONS:
+        return logic.DIMENSIONS.index(name)
+    raise ValueError(f"Unknown dimension '{name}'")
+
+def _delta_vector(deltas):
+    """A mapping (score column or dimension name -> delta) or five deltas as an array."""
+    if isinstance(deltas, dict):
+        vector = np.zeros(len(logic.SCORE_COLUMNS))
+        for name, delta in deltas.items():
+            vector[_dimension_position(name)] = delta
+        return vector
+    return np.asarray(deltas, dtype=float)
+
+def delta_grid(steps):
+    """
+    Every combination of score changes: steps maps a score column or
+    dimension name to the deltas to try, dimensions left out stay at 0.
+    Returns an (m, 5) array in SCORE_COLUMNS order.
+    """
+    axes = [[0.0] for _ in logic.SCORE_COLUMNS]
+    for name, values in steps.items():
+        axes[_dimension_position(name)] = np.atleast_1d(np.asarray(values, dtype=float))
+    mesh = np.meshgrid(*axes, indexing='ij')
+    return np.stack([axis.ravel() for axis in mesh], axis=1)
+
+def random_deltas(n, spread=1.0, dimensions=None, seed=None):
+    """
+    n random scenarios: each named dimension (default all) changed by a
+    uniform amount in [-spread, spread], rounded to the form's 0.1 step.
+    Returns an (n, 5) array in SCORE_COLUMNS order.
+    """
+    rng = np.random.default_rng(seed)
+    deltas = np.zeros((n, len(logic.SCORE_COLUMNS)))
+    names = logic.SCORE_COLUMNS if dimensions is None else dimensions
+    for name in names:
+        deltas[:, _dimension_position(name)] = np.round(rng.uniform(-spread, spread, n), 1) + 0.0  # no -0.0
+    return deltas
+
+class Simulation:
+    """
+    Outcome of applying every scenario (one row of score deltas) to every
+    department at once. Nothing is written: the baseline is a frame of
+    assessments such as database.load_latest_assessments(), and simulated
+    scores are clipped to the assessment scale.
+
+    indices, levels and changed_recommendations are (scenarios, departments)
+    arrays: the simulated Maturity Index, its position in MATURITY_LABELS and
+    how many recommendations differ from the baseline.
+    """
+    def __init__(self, df, deltas, weights=None, rules=None):
+        self.rules = rules if rules is not None else logic.get_rules()
+        self.weights = weights
+        self.departments = pd.Index(df['department'].astype(str)) if 'department' in df else df.index
+        self.scores = logic.widen_scores(df[logic.SCORE_COLUMNS].to_numpy())
+        self.deltas = np.atleast_2d(_delta_vector(deltas))
+        if self.deltas.ndim != 2 or self.deltas.shape[1] != len(logic.SCORE_COLUMNS):
+            raise ValueError(f"Expected (m, {len(logic.SCORE_COLUMNS)}) score deltas, got shape {self.deltas.shape}")
+        self._rule_positions = [logic.SCORE_COLUMNS.index(rule.column) for rule in self.rules]
+
+        self.baseline_index = logic.calculate_maturity_indices(self.scores, weights)
+        self.baseline_levels = logic.label_codes(self.baseline_index)
+        self.baseline_bands = self._bands(self.scores)
+
+        m, n = len(self.deltas), len(self.scores)
+        self.indices = np.empty((m, n))
+        self.levels = np.empty((m, n), dtype=np.int8)
+        self.changed_recommendations = np.empty((m, n), dtype=np.int8)
+        step = max(1, CHUNK_CELLS // max(n, 1))
+        for start in range(0, m, step):
+            block = slice(start, start + step)
+            scores = self.simulated_scores(block)
+            indices = logic.calculate_maturity_indices(scores.reshape(-1, len(logic.SCORE_COLUMNS)), weights)
+            self.indices[block] = indices.reshape(scores.shape[:2])
+            self.levels[block] = logic.label_codes(self.indices[block])
+            self.changed_recommendations[block] = (self._bands(scores) != self.baseline_bands).sum(axis=-1)
+
+    def _bands(self, scores):
+        """Recommendation band of every rule for scores (..., 5) -> (..., n_rules)."""
+        return np.stack([rule.bands(scores[..., j]) for rule, j in zip(self.rules, self._rule_positions)], axis=-1)
+
+    def simulated_scores(self, scenarios=slice(None)):
+        """(scenarios, departments, 5) scores with the deltas applied and clipped to the scale."""
+        deltas = np.atleast_2d(self.deltas[scenarios])
+        scores = np.round(self.scores[np.newaxis] + deltas[:, np.newaxis], logic.SCORE_DECIMALS)
+        return np.clip(scores, validation.SCORE_MIN, validation.SCORE_MAX)
+
+    def summary(self):
+        """
+        One row per scenario: its deltas, the mean simulated Maturity Index
+        and change, how many departments move up or down a maturity level
+        and how many get at least one different recommendation.
+        """
+        summary = pd.DataFrame(self.deltas, columns=logic.DIMENSIONS)
+        summary['Maturity Index'] = self.indices.mean(axis=1)
+        summary['Index Change'] = (self.indices - self.baseline_index).mean(axis=1)
+        summary['Level Ups'] = (self.levels > self.baseline_levels).sum(axis=1)
+        summary['Level Downs'] = (self.levels < self.baseline_levels).sum(axis=1)
+        summary['Changed Recommendations'] = (self.changed_recommendations > 0).sum(axis=1)
+        return summary
+
+    def transitions(self, scenario=0):
+        """Department counts from current (rows) to simulated (columns) maturity level."""
+        return pd.crosstab(
+            logic.get_labels(self.baseline_index), logic.get_labels(self.indices[scenario]),
+            rownames=['Current'], colnames=['Simulated'], dropna=False,
+        )
+
+    def department_results(self, scenario=0):
+        """
+        Per-department outcome of one scenario: current and simulated Maturity
+        Index and label, and the new recommendation of every dimension whose
+        advice changes ('' where it stays the same).
+        """
+        scores = self.simulated_scores(scenario)[0]
+        bands = self._bands(scores)
+        result = pd.DataFrame({
+            'Current Index': self.baseline_index,
+            'Maturity Index': self.indices[scenario],
+            'Current Label': logic.get_labels(self.baseline_index),
+            'Maturity Label': logic.get_labels(self.indices[scenario]),
+        }, index=self.departments)
+        for j, rule in enumerate(self.rules):
+            changed = bands[:, j] != self.baseline_bands[:, j]
+            result[rule.dimension] = np.where(changed, rule.messages.take(bands[:, j]), '')
+        return result
+
+@instrumentation.timed()
+def simulate(df, deltas, weights=None, rules=None):
+    """Runs a Simulation of deltas (an (m, 5) array, five deltas or a mapping) over df."""
+    return Simulation(df, deltas, weights, rules)
+
+@instrumentation.timed()
+def sensitivity(df, base=None, steps=SENSITIVITY_STEPS, weights=None, rules=None):
+    """
+    Moves one dimension at a time over steps on top of the base deltas and
+    returns the Simulation summary with 'Dimension' and 'Step' columns, the
+    input of a sensitivity chart.
+    """
+    base = np.zeros(len(logic.SCORE_COLUMNS)) if base is None else _delta_vector(base)
+    steps = np.asarray(steps, dtype=float)
+    deltas = np.repeat(base[np.newaxis], len(logic.SCORE_COLUMNS) * len(steps), axis=0)
+    for j in range(len(logic.SCORE_COLUMNS)):
+        deltas[j * len(steps):(j + 1) * len(steps), j] += steps
+    summary = simulate(df, deltas, weights, rules).summary()
+    summary.insert(0, 'Dimension', np.repeat(logic.DIMENSIONS, len(steps)))
+    summary.insert(1, 'Step', np.tile(steps, len(logic.SCORE_COLUMNS)))
+    return summary
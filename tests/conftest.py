@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh database file for one test; the writer and pool follow DB_NAME."""
+    monkeypatch.setattr(database, 'DB_NAME', str(tmp_path / 'test.db'))
+    database.init_db()
+    yield database
+    database.flush_writes()
+    database.close_connections()
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+
+def upload(*rows):
+    return pd.DataFrame(rows, columns=['department', 'tech_score', 'culture_score', 'process_score', 'skills_score', 'risk_score'])
+
+
+def periods(db):
+    with db.get_connection() as conn:
+        return conn.execute("SELECT period, timestamp FROM assessments ORDER BY period").fetchall()
+
+
+def test_check_period_accepts_month_keys(db):
+    assert db.check_period('2024-05-01') == '2024-05-01'
+    assert db.check_period(db.current_period()) == db.current_period()
+
+
+@pytest.mark.parametrize('period', ['2024-13-99', '2024-05-02', '2024-5-1', 'May 2024', ''])
+def test_check_period_rejects_other_keys(db, period):
+    with pytest.raises(ValueError):
+        db.check_period(period)
+
+
+def test_upsert_rejects_invalid_period(db):
+    with pytest.raises(ValueError):
+        db.upsert_assessments(upload(('Finance', 3, 3, 3, 3, 3)), '2024-13-99')
+    assert periods(db) == []
+
+
+def test_backfilled_period_is_dated_to_its_month(db):
+    db.upsert_assessments(upload(('Finance', 3, 3, 3, 3, 3)), '2024-03-01')
+    db.upsert_assessments(upload(('Finance', 4, 4, 4, 4, 4)))
+    assert periods(db)[0] == ('2024-03-01', '2024-03-01 00:00:00')
+    assert periods(db)[1][0] == db.current_period()
+    assert db.load_latest_assessments()['tech_score'].tolist() == [4]
+
+
+def test_compact_keeps_every_upserted_period(db):
+    for period in ['2024-03-01', '2024-04-01']:
+        db.upsert_assessments(upload(('Finance', 3, 3, 3, 3, 3)), period)
+    # Rows upserted before timestamps followed the period share the import month
+    with db.get_connection() as conn:
+        conn.execute("UPDATE assessments SET timestamp = '2024-04-15 10:00:00'")
+        conn.commit()
+
+    assert db.compact_assessments('month') == 0
+    assert [row[0] for row in periods(db)] == ['2024-03-01', '2024-04-01']
+
+
+def test_compact_removes_appended_duplicates(db):
+    db.bulk_save_assessments(upload(('Finance', 3, 3, 3, 3, 3), ('Finance', 3, 3, 3, 3, 3), ('Finance', 2, 3, 3, 3, 3)))
+    assert db.compact_assessments('month') == 1
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM assessments").fetchone()[0] == 2
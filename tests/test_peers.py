@@ -0,0 +1,54 @@
+import math
+
+import pandas as pd
+
+import peers
+
+
+def latest(*rows):
+    return pd.DataFrame(rows, columns=['department', 'tech_score', 'culture_score', 'process_score', 'skills_score', 'risk_score'])
+
+
+def make_index():
+    index = peers.PeerIndex()
+    index.refresh(latest(
+        ('Finance', 3, 3, 3, 3, 3),
+        ('HR', 3.1, 3, 3, 3, 3),
+        ('CSE_Student_1', 2, 2, 2, 2, 2),
+        ('CSE_Student_2', 4, 4, 4, 4, 4),
+        ('ECE_Faculty_1', 3, 3, 3, 3, 3),
+    ))
+    return index
+
+
+def test_departments_without_role_have_no_role_cohort():
+    index = make_index()
+    standings = index.standings(['Finance', 'HR', 'CSE_Student_1'], 'Same role')
+
+    assert standings.loc[['Finance', 'HR']].isna().all().all()
+    assert standings.loc['CSE_Student_1', 'peers'] == 2
+    assert '' not in index._state.groups['Same role']
+    assert index.similar('Finance', cohort='Same role').empty
+    assert index.closest_higher('Finance', cohort='Same role') is None
+
+
+def test_departments_without_role_still_rank_among_all():
+    index = make_index()
+    standing = index.standings(['Finance'])
+
+    assert standing.loc['Finance', 'peers'] == 5
+    assert index.similar('Finance', 1).index.tolist() == ['ECE_Faculty_1']
+
+
+def test_role_cohort_follows_renamed_departments():
+    index = make_index()
+    index.refresh(latest(
+        ('Finance_Student_1', 3, 3, 3, 3, 3),
+        ('HR', 3.1, 3, 3, 3, 3),
+        ('CSE_Student_1', 2, 2, 2, 2, 2),
+        ('CSE_Student_2', 4, 4, 4, 4, 4),
+        ('ECE_Faculty_1', 3, 3, 3, 3, 3),
+    ))
+
+    assert index.standings(['CSE_Student_1'], 'Same role').loc['CSE_Student_1', 'peers'] == 3
+    assert math.isnan(index.standings(['HR'], 'Same role').loc['HR', 'peers'])
@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+import instrumentation
+import reports
+
+
+@pytest.fixture
+def tracing():
+    instrumentation.configure(1.0)
+    instrumentation.reset()
+    reports.cache.clear()
+    yield
+    instrumentation.configure(0.0)
+    instrumentation.reset()
+    reports.shutdown()
+
+
+def spans(wait_for=None, timeout=5):
+    """Recorded span totals; the render span is closed by a callback that may run just after result() returns."""
+    deadline = time.monotonic() + timeout
+    while True:
+        totals = {row['span']: row for row in instrumentation.summary()}
+        if wait_for is None or wait_for in totals or time.monotonic() > deadline:
+            return totals
+        time.sleep(0.01)
+
+
+def test_pool_renders_are_timed_in_the_calling_process(tracing):
+    scores = dict.fromkeys(reports.REPORT_SCORES, 3.0)
+    with instrumentation.span('export'):
+        data = reports.get_report('Finance', scores, {'Tech': 'Automate'})
+        reports.get_report('Finance', scores, {'Tech': 'Automate'})  # cached, not rendered again
+
+    render = spans('reports.render')['reports.render']
+    assert render['calls'] == 1
+    assert render['bytes'] == len(data)
+    trace = {span['span']: span for span in instrumentation.recent()}
+    assert trace['reports.render']['trace'] == trace['export']['trace']
+    assert trace['reports.render']['depth'] == 2
@@ -0,0 +1,40 @@
+import time
+
+
+def slow_insert(db):
+    def insert(conn, rows):
+        time.sleep(0.05)
+        return db._insert_chunk(conn, rows)
+    return insert
+
+
+def queue_chunks(db, count=5):
+    writer = db.get_writer()
+    insert = slow_insert(db)
+    return [
+        writer.submit(insert, [(f'D{i}_{j}', 3, 3, 3, 3, 3) for j in range(50)], rows=50, bulk=True)
+        for i in range(count)
+    ]
+
+
+def test_clear_waits_for_queued_writes(db):
+    chunks = queue_chunks(db)
+    db.submit_assessment('Early', 1, 1, 1, 1, 1)
+    db.clear_data()
+    late = db.submit_assessment('Late', 2, 2, 2, 2, 2)
+    late.result()
+
+    assert all(chunk.done() for chunk in chunks)
+    assert db.get_departments() == ['Late']
+
+
+def test_compact_waits_for_queued_writes(db):
+    chunks = queue_chunks(db)
+    # The second round repeats every row of the first, so compaction removes those copies
+    chunks += queue_chunks(db)
+    removed = db.compact_assessments('month')
+
+    assert all(chunk.done() for chunk in chunks)
+    assert removed == 250
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM assessments").fetchone()[0] == 250
@@ -0,0 +1,146 @@
+import io
+from collections import Counter
+import numpy as np
+import pandas as pd
+import database
+
+# Valid range of every dimension score (the Assessment form's slider range)
+SCORE_MIN = 1.0
+SCORE_MAX = 5.0
+# Rejected rows kept for the error report; any beyond this are only counted
+MAX_REPORTED_ERRORS = 10000
+
+class SeenRows:
+    """
+    Hashes of the rows accepted so far, for duplicate detection across chunks.
+    Kept as sorted uint64 runs that are merged like a binary counter, so
+    memory is 8 bytes per row and total work O(n log n).
+    """
+    def __init__(self):
+        self.runs = []
+
+    def check_and_add(self, hashes):
+        """Returns a mask of hashes seen before (or earlier in hashes) and records the rest."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        seen = pd.Series(hashes).duplicated().to_numpy().copy()
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, hashes), len(run) - 1)
+            seen |= run[positions] == hashes
+
+        # Unseen hashes are distinct from each other and from every run
+        new = np.sort(hashes[~seen])
+        while self.runs and len(self.runs[-1]) <= len(new):
+            new = np.sort(np.concatenate([self.runs.pop(), new]))
+        if len(new):
+            self.runs.append(new)
+        return seen
+
+class ValidationReport:
+    """
+    Validates upload chunks on their way to database.bulk_save_assessments
+    and collects the rejected rows:
+
+        report = ValidationReport()
+        database.bulk_save_assessments(report.validate(chunks))
+        report.to_csv()
+    """
+    def __init__(self, max_errors=MAX_REPORTED_ERRORS):
+        self.max_errors = max_errors
+        self.rows_read = 0
+        self.rows_valid = 0
+        self.rows_rejected = 0
+        self.reasons = Counter()
+        self._errors = []
+        self._reported = 0
+        self._seen = SeenRows()
+
+    def validate(self, chunks):
+        """Yield the valid rows of each chunk (CSV headers or table columns) in table columns."""
+        for chunk in chunks:
+            valid = self.validate_chunk(chunk)
+            if len(valid):
+                yield valid
+
+    def validate_chunk(self, chunk):
+        """
+        Check one chunk with whole-column operations: blank departments,
+        missing, non-numeric or out-of-range scores, and rows repeating an
+        earlier row of the upload. Returns the valid rows with stripped
+        department names and float scores.
+        """
+        chunk = chunk.rename(columns=database.CSV_COLUMNS)
+        first_row = self.rows_read + 1
+        self.rows_read += len(chunk)
+
+        department = chunk['department'].astype('string').str.strip()
+        problems = {'blank department': department.isna().to_numpy() | (department == '').to_numpy(na_value=False)}
+        scores = {}
+        for header, col in database.CSV_COLUMNS.items():
+            if col == 'department':
+                continue
+            raw = chunk[col]
+            values = database.score_values(pd.to_numeric(raw, errors='coerce'))
+            missing = raw.isna().to_numpy().copy()
+            if not pd.api.types.is_numeric_dtype(raw):
+                missing |= (raw.astype('string').str.strip() == '').to_numpy(na_value=False)
+            problems[f'missing {header}'] = missing
+            problems[f'non-numeric {header}'] = np.isnan(values) & ~missing
+            with np.errstate(invalid='ignore'):
+                problems[f'{header} outside {SCORE_MIN:g}-{SCORE_MAX:g}'] = (values < SCORE_MIN) | (values > SCORE_MAX)
+            scores[col] = values
+
+        valid = pd.DataFrame({'department': department.to_numpy(dtype=object, na_value=None), **scores}, index=chunk.index)
+        bad = np.logical_or.reduce(list(problems.values()))
+        duplicate = np.zeros(len(chunk), dtype=bool)
+        if (~bad).any():
+            hashes = pd.util.hash_pandas_object(valid[~bad], index=False).to_numpy()
+            duplicate[~bad] = self._seen.check_and_add(hashes)
+        problems['duplicate row'] = duplicate
+        bad |= duplicate
+
+        if bad.any():
+            self._reject(chunk, bad, problems, first_row)
+        valid = valid[~bad]
+        self.rows_valid += len(valid)
+        return valid
+
+    def _reject(self, chunk, bad, problems, first_row):
+        rows = np.flatnonzero(bad)
+        self.rows_rejected += len(rows)
+        for reason, mask in problems.items():
+            count = int(mask.sum())
+            if count:
+                self.reasons[reason] += count
+
+        room = self.max_errors - self._reported
+        if room <= 0:
+            return
+        rows = rows[:room]
+        messages = [
+            '; '.join(reason for reason, mask in problems.items() if mask[i])
+            for i in rows
+        ]
+        errors = chunk.iloc[rows].rename(columns={col: header for header, col in database.CSV_COLUMNS.items()})
+        errors.insert(0, 'Error', messages)
+        errors.insert(0, 'Row', rows + first_row)
+        self._errors.append(errors)
+        self._reported += len(rows)
+
+    def summary(self):
+        """One-line description of the outcome, e.g. for a status message."""
+        text = f"{self.rows_valid:,} of {self.rows_read:,} rows valid"
+        if self.rows_rejected:
+            top = ', '.join(f"{count:,} {reason}" for reason, count in self.reasons.most_common(3))
+            text += f", {self.rows_rejected:,} rejected ({top})"
+        return text
+
+    def to_csv(self):
+        """Rejected rows (data row number, header excluded), their reasons and original values as CSV text."""
+        columns = ['Row', 'Error'] + list(database.CSV_COLUMNS)
+        if not self._errors:
+            return pd.DataFrame(columns=columns).to_csv(index=False)
+        out = io.StringIO()
+        pd.concat(self._errors, ignore_index=True).reindex(columns=columns).to_csv(out, index=False)
+        if self.rows_rejected > self._reported:
+            out.write(f"# {self.rows_rejected - self._reported:,} more rejected rows not listed\n")
+        return out.getvalue()